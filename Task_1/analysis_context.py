@@ -0,0 +1,52 @@
+# --- Analysis Context ---
+import threading
+
+import pandas as pd
+
+# Named aggregate -> (group keys, {column: aggregation}). Each name is one
+# groupby over the filtered rows, holding every column any chart or table
+# needs at that grain.
+AGGREGATES = {
+    'by_campaign': (['campaign ID'], {
+        'Click-Through Rate (CTR in %)': 'mean',
+        'Cost Per Click (CPC)': 'mean',
+        'Cost per Result (CPR)': 'mean',
+        'Efficiency Score': 'mean',
+        'Amount Spent': 'sum',
+        'Impressions': 'sum',
+        'Clicks': 'sum',
+        'Unique Clicks': 'sum',
+        'Unique Link Clicks (ULC)': 'sum',
+        'ROI Score': 'mean',
+        'CPM': 'mean',
+    }),
+    'by_age': (['Age'], {
+        'Cost Per Click (CPC)': 'mean',
+        'Click-Through Rate (CTR in %)': 'mean',
+        'Impressions': 'sum',
+    }),
+    'by_geography': (['Geography'], {'Amount Spent': 'sum'}),
+    'by_audience': (['Audience'], {'Clicks': 'sum'}),
+    'by_campaign_age': (['campaign ID', 'Age'], {'Reach': 'sum', 'Impressions': 'sum'}),
+    'by_geography_age': (['Geography', 'Age'], {'Cost per Result (CPR)': 'mean'}),
+}
+
+
+class AnalysisContext:
+    # One rerun's filtered rows plus the AGGREGATES built from them. Each
+    # aggregate is computed on first use and shared by every later caller,
+    # the main page and the additional charts alike, so each groupby runs at
+    # most once per rerun. Figure builders run on worker threads, so every
+    # name has its own lock; callers must not modify the frames they get.
+
+    def __init__(self, filtered: pd.DataFrame):
+        self.filtered = filtered
+        self._results = {}
+        self._locks = {name: threading.Lock() for name in AGGREGATES}
+
+    def __getitem__(self, name):
+        with self._locks[name]:
+            if name not in self._results:
+                by, columns = AGGREGATES[name]
+                self._results[name] = self.filtered.groupby(by).agg(columns).reset_index()
+        return self._results[name]
@@ -0,0 +1,170 @@
+# --- Budget Reallocation Optimizer ---
+import numpy as np
+import pandas as pd
+
+from columns import CELL_COLUMNS
+from scoring import composite_score
+
+# Elasticity bounds: below 1 keeps returns diminishing, above 0 keeps them positive
+MIN_ELASTICITY = 0.2
+MAX_ELASTICITY = 0.9
+DEFAULT_ELASTICITY = 0.6
+
+BISECTION_STEPS = 100
+
+
+def _log_slopes(x, y, groups):
+    # Centred sums of squares and cross-products of y on x within each group,
+    # all groups at once, plus each group's least-squares slope
+    frame = pd.DataFrame({'group': groups, 'x': x, 'y': y})
+    frame['xx'] = x * x
+    frame['xy'] = x * y
+    sums = frame.groupby('group', sort=False).agg(n=('x', 'size'), x=('x', 'sum'), y=('y', 'sum'),
+                                                  xx=('xx', 'sum'), xy=('xy', 'sum'))
+    fit = pd.DataFrame({
+        'sxx': sums['xx'] - sums['x'] ** 2 / sums['n'],
+        'sxy': sums['xy'] - sums['x'] * sums['y'] / sums['n'],
+    })
+    fit.loc[fit['sxx'] <= 1e-9, 'sxx'] = np.nan
+    fit['slope'] = fit['sxy'] / fit['sxx']
+    return fit
+
+
+def fit_response_curves(df: pd.DataFrame):
+    # Fit results = scale * spend ** elasticity for every campaign x age x
+    # geography cell. Cells observed at several spend levels (e.g. one row per
+    # day) get their own log-log slope ('Fitted'). Other cells take the slope
+    # pooled within those cells ('Pooled'); comparing spend across cells
+    # would mostly measure audience size, so it is never used. With no cell
+    # observed at more than one spend level nothing can be fitted, and every
+    # cell gets DEFAULT_ELASTICITY ('Assumed'). 'Elasticity Clipped' marks
+    # slopes pulled back into [MIN_ELASTICITY, MAX_ELASTICITY]. Each curve is
+    # then scaled to pass through the cell's observed total, so the current
+    # allocation is reproduced exactly.
+    observed = df[(df['Amount Spent'] > 0) & (df['Unique Link Clicks (ULC)'] > 0)]
+    log_spend = np.log(observed['Amount Spent'].to_numpy(dtype=float))
+    log_results = np.log(observed['Unique Link Clicks (ULC)'].to_numpy(dtype=float))
+
+    cells = df.groupby(CELL_COLUMNS)[['Amount Spent', 'Impressions', 'Clicks', 'Unique Link Clicks (ULC)']].sum()
+    slopes = pd.Series(np.nan, index=cells.index.to_flat_index())
+    pooled = np.nan
+    if len(observed):
+        keys = pd.MultiIndex.from_frame(observed[CELL_COLUMNS])
+        fit = _log_slopes(log_spend, log_results, keys.to_flat_index())
+        slopes = fit['slope'].reindex(slopes.index)
+        varied = fit['sxx'].notna()
+        if varied.any():
+            pooled = fit.loc[varied, 'sxy'].sum() / fit.loc[varied, 'sxx'].sum()
+
+    fitted = slopes.notna().to_numpy()
+    if np.isnan(pooled):
+        cells['Elasticity Source'] = np.where(fitted, 'Fitted', 'Assumed')
+        fallback = DEFAULT_ELASTICITY
+    else:
+        cells['Elasticity Source'] = np.where(fitted, 'Fitted', 'Pooled')
+        fallback = pooled
+    elasticity = np.where(fitted, slopes.to_numpy(), fallback)
+    cells['Elasticity'] = np.clip(elasticity, MIN_ELASTICITY, MAX_ELASTICITY)
+    cells['Elasticity Clipped'] = cells['Elasticity'].to_numpy() != elasticity
+
+    spend = cells['Amount Spent'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = cells['Unique Link Clicks (ULC)'].to_numpy(dtype=float) / spend ** cells['Elasticity'].to_numpy()
+    cells['Scale'] = np.where(spend > 0, scale, 0.0)
+
+    return cells.reset_index()
+
+
+def curves_are_assumed(curves: pd.DataFrame):
+    # True when the curves rest on an assumption rather than the data: no
+    # cell could be fitted, or the pooled slope the unfitted cells share fell
+    # outside the elasticity bounds and was clipped to one of them
+    fitted = curves['Elasticity Source'] == 'Fitted'
+    pooled = curves['Elasticity Source'] == 'Pooled'
+    return bool(not fitted.any() or (pooled & curves['Elasticity Clipped']).any())
+
+
+def optimize_allocation(curves: pd.DataFrame, budget, min_share=0.5, max_share=3.0):
+    # Maximise total projected results subject to sum(spend) == budget and each
+    # cell staying within [min_share, max_share] x its current spend (bounds
+    # keep the fitted curves near the spend levels they were fitted on).
+    # The objective is concave, so the optimum equalises marginal returns
+    # scale * elasticity * spend ** (elasticity - 1) = lam across the cells
+    # that are not at a bound; lam is found by bisection, each step a single
+    # vectorized pass over all cells.
+    current = curves['Amount Spent'].to_numpy(dtype=float)
+    scale = curves['Scale'].to_numpy(dtype=float)
+    elasticity = curves['Elasticity'].to_numpy(dtype=float)
+    lower = current * min_share
+    upper = current * max_share
+
+    if budget < lower.sum() - 1e-6 or budget > upper.sum() + 1e-6:
+        raise ValueError(
+            f"Budget {budget:,.2f} is outside the feasible range "
+            f"{lower.sum():,.2f} - {upper.sum():,.2f} for these spend bounds"
+        )
+
+    active = scale > 0
+    log_gain = np.full(len(curves), -np.inf)
+    log_gain[active] = np.log(scale[active] * elasticity[active])
+
+    def spend_at(log_lam):
+        with np.errstate(over='ignore'):
+            free = np.exp((log_gain - log_lam) / (1 - elasticity))
+        return np.clip(free, lower, upper)
+
+    # Total spend falls as lam rises; bracket it in log space and bisect
+    lo, hi = -60.0, 60.0
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        if spend_at(mid).sum() > budget:
+            lo = mid
+        else:
+            hi = mid
+    optimal = spend_at(hi)
+
+    # Spread any rounding remainder over the cells with room left
+    remainder = budget - optimal.sum()
+    room = np.where(remainder > 0, upper - optimal, optimal - lower)
+    if room.sum() > 0:
+        optimal += remainder * room / room.sum()
+
+    allocation = curves.copy()
+    allocation['Optimal Spend'] = optimal
+    allocation['Projected Results'] = scale * optimal ** elasticity
+    return allocation
+
+
+def summarize_allocation(allocation: pd.DataFrame):
+    # Current vs projected spend, results and composite score per campaign.
+    # CTR is held at each cell's observed value, so efficiency moves only
+    # through CPR.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cell_ctr = allocation['Clicks'] / allocation['Impressions'] * 100
+
+        def campaign_metrics(spend, results):
+            cells = pd.DataFrame({
+                'campaign ID': allocation['campaign ID'],
+                'Spend': spend,
+                'Results': results,
+                'ROI': results / spend,
+                'CPR': spend / results,
+                'Efficiency': cell_ctr / (spend / results),
+            }).replace([np.inf, -np.inf], np.nan)
+            return cells.groupby('campaign ID').agg(
+                Spend=('Spend', 'sum'), Results=('Results', 'sum'),
+                ROI=('ROI', 'mean'), CPR=('CPR', 'mean'), Efficiency=('Efficiency', 'mean'))
+
+        before = campaign_metrics(allocation['Amount Spent'], allocation['Unique Link Clicks (ULC)'])
+        after = campaign_metrics(allocation['Optimal Spend'], allocation['Projected Results'])
+
+    summary = pd.DataFrame({
+        'Current Spend': before['Spend'],
+        'Optimal Spend': after['Spend'],
+        'Current Results': before['Results'],
+        'Projected Results': after['Results'],
+        'Current Score': composite_score(before['Efficiency'], before['ROI'], before['CPR']),
+        'Projected Score': composite_score(after['Efficiency'], after['ROI'], after['CPR']),
+    })
+    summary['Spend Change'] = summary['Optimal Spend'] - summary['Current Spend']
+    return summary.reset_index()
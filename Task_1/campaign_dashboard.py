@@ -1,16 +1,91 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
-from visualizations_additional import additional_visualizations
-from load_data import load_data
+from startup import prewarm_imports
+from load_data import (load_data, load_headline, load_quality_report, load_bootstrap_scores, load_anomalies,
+                       headline_metrics, DATE_COLUMN)
 from custom_layout import apply_custom_layout
+from render_scheduler import build_figures
+from figure_encoding import compact_figure
+from time_series import load_windowed_kpis, KPI_COLUMNS
+from live_metrics import get_live_metrics, LIVE_REFRESH_SECONDS
+from scoring import composite_score
+from budget_optimizer import (DEFAULT_ELASTICITY, MAX_ELASTICITY, MIN_ELASTICITY, curves_are_assumed,
+                              fit_response_curves, optimize_allocation, summarize_allocation)
+from exports import (EXPORT_FORMATS, MAX_DOWNLOAD_BYTES, estimate_export_bytes, export_file,
+                     export_file_name, export_mime)
+from segments import SEGMENT_COLUMNS, cross_segments, evaluate_segments
+from analysis_context import AnalysisContext
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Campaign Performance Analyzer", layout="wide")
 
+# Plotly and pycountry load in the background while the KPI cards are drawn
+prewarm_imports()
+
+# Define style for metric cards
+card_style = """
+    background-color: #f5f7fa;
+    padding: 20px;
+    border-radius: 10px;
+    box-shadow: 2px 2px 10px rgba(0,0,0,0.05);
+    text-align: center;
+"""
+
+
+def render_kpi_cards(container, metrics):
+    # Total Spend, Average CTR, Average CPC and Average CPR as four cards
+    card_values = {
+        'Total Spend': f"${metrics['Total Spend']:,.2f}",
+        'Average CTR': f"{metrics['Average CTR']:.2f}%",
+        'Average CPC': f"${metrics['Average CPC']:.2f}",
+        'Average CPR': f"${metrics['Average CPR']:.2f}",
+    }
+    with container.container():
+        for col, (label, value) in zip(st.columns(4), card_values.items()):
+            with col:
+                st.markdown(f"""
+                <div style="{card_style}">
+                    <h4>{label}</h4>
+                    <h2>{value}</h2>
+                </div>
+                """, unsafe_allow_html=True)
+
+
+def render_export_buttons(name, frame, container=st):
+    # One download button per format. The file is only encoded when a button is
+    # clicked, chunk by chunk through the streaming writers in exports.py.
+    # Exports too large to hold in memory are pointed to disk instead.
+    size = estimate_export_bytes(frame)
+    if size > MAX_DOWNLOAD_BYTES:
+        container.info(f"This export is about {size / 1e6:,.0f} MB, too large to download through the browser. "
+                       "Write it to disk instead with `python exports.py <output> --format CSV` "
+                       "(all cleaned rows) or `exports.write_export(frame, fmt, path)` for a filtered frame.")
+        return
+    for col, fmt in zip(container.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+        col.download_button(
+            f"⬇️ {fmt}",
+            data=lambda fmt=fmt: export_file(frame, fmt),
+            file_name=export_file_name(name, fmt),
+            mime=export_mime(fmt),
+            key=f"export_{name}_{fmt}",
+            on_click='ignore',
+        )
+
+
 try:
+    # --- Main Dashboard ---
+    st.title("🎯 Campaign Performance Analysis")
+    st.write("Use this dashboard to analyze market data performance of globalshala and identify which campaigns to optimize or discontinue.")
+    
+    # --- Overall KPIs ---
+    st.header("📊 Overall Campaign Performance")
+
+    # Drawn straight from the precompiled snapshot header, before the full
+    # frame is loaded; redrawn below if the filters narrow the data
+    kpi_cards = st.empty()
+    render_kpi_cards(kpi_cards, load_headline())
+
     df = load_data()
     
     # Print column names to debug
@@ -30,131 +105,230 @@ try:
 
     geos = st.sidebar.multiselect("Geography", df['Geography'].unique(), default=df['Geography'].unique())
 
+    # Date range, only offered when the data has a per-row date
+    has_dates = DATE_COLUMN in df.columns
+    if has_dates:
+        min_date, max_date = df[DATE_COLUMN].min().date(), df[DATE_COLUMN].max().date()
+        if min_date == max_date:
+            # st.slider rejects an empty range, and one day leaves nothing to pick
+            st.sidebar.caption(f"Date: {min_date}")
+            date_range = (min_date, max_date)
+        else:
+            date_range = st.sidebar.slider("Date Range", min_date, max_date, (min_date, max_date))
+
+    # Live mode tails the local event stream instead of the static CSV
+    live_mode = st.sidebar.toggle("📡 Live Mode", value=False)
+
     # Filter data based on selections
     filtered_df = df[(df['campaign ID'].isin(selected_campaigns)) & 
                      (df['Audience'].isin(selected_audiences)) & 
                      (df['Age'].isin(selected_age_groups)) &
                      (df['Geography'].isin(geos))]    
-    
-    # --- Main Dashboard ---
-    st.title("🎯 Campaign Performance Analysis")
-    st.write("Use this dashboard to analyze market data performance of globalshala and identify which campaigns to optimize or discontinue.")
-    
-    # --- Overall KPIs ---
-    st.header("📊 Overall Campaign Performance")
+    if has_dates:
+        filtered_df = filtered_df[filtered_df[DATE_COLUMN].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))]
 
-    # Define style for metric cards
-    card_style = """
-        background-color: #f5f7fa;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 2px 2px 10px rgba(0,0,0,0.05);
-        text-align: center;
-    """
+    if len(filtered_df) < len(df):
+        render_kpi_cards(kpi_cards, headline_metrics(filtered_df))
 
-    col1, col2, col3, col4 = st.columns(4)
+    # Shared, lazily built aggregates of filtered_df for this rerun
+    context = AnalysisContext(filtered_df)
 
-    with col1:
-        total_spent = filtered_df['Amount Spent'].sum()
-        st.markdown(f"""
-        <div style="{card_style}">
-            <h4>Total Spend</h4>
-            <h2>${total_spent:,.2f}</h2>
-        </div>
-        """, unsafe_allow_html=True)
+    st.sidebar.header("📥 Export Filtered Rows")
+    render_export_buttons("filtered_rows", filtered_df, st.sidebar)
 
-    with col2:
-        avg_ctr = filtered_df['Click-Through Rate (CTR in %)'].mean()
-        st.markdown(f"""
-        <div style="{card_style}">
-            <h4>Average CTR</h4>
-            <h2>{avg_ctr:.2f}%</h2>
-        </div>
-        """, unsafe_allow_html=True)
+    # Charting stack, imported here rather than at the top so the cards above
+    # are on screen first (prewarm_imports has usually finished by now)
+    import plotly.express as px
+    import plotly.graph_objects as go
 
-    with col3:
-        avg_cpc = filtered_df['Cost Per Click (CPC)'].mean()
-        st.markdown(f"""
-        <div style="{card_style}">
-            <h4>Average CPC</h4>
-            <h2>${avg_cpc:.2f}</h2>
-        </div>
-        """, unsafe_allow_html=True)
-
-    with col4:
-        avg_cpr = filtered_df['Cost per Result (CPR)'].mean()
-        st.markdown(f"""
-        <div style="{card_style}">
-            <h4>Average CPR</h4>
-            <h2>${avg_cpr:.2f}</h2>
-        </div>
-        """, unsafe_allow_html=True)
+    from visualizations_additional import additional_visualizations
+
+    # --- Live KPIs ---
+    if live_mode:
+        st.header("📡 Live Campaign Performance")
+        st.caption(f"Refreshes every {LIVE_REFRESH_SECONDS}s from the local event stream")
+
+        @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+        def live_kpi_cards():
+            live_kpis, live_events = get_live_metrics().refresh()
+            live_kpis = live_kpis[live_kpis['campaign ID'].isin(selected_campaigns)]
+
+            # Ratios of the streamed totals, so busy campaigns weigh more
+            live_spent = live_kpis['Amount Spent'].sum()
+            live_clicks = live_kpis['Clicks'].sum()
+            live_impressions = live_kpis['Impressions'].sum()
+            live_results = live_kpis['Unique Link Clicks (ULC)'].sum()
+            render_kpi_cards(st.empty(), {
+                'Total Spend': live_spent,
+                'Average CTR': live_clicks / live_impressions * 100 if live_impressions else 0,
+                'Average CPC': live_spent / live_clicks if live_clicks else 0,
+                'Average CPR': live_spent / live_results if live_results else 0,
+            })
+
+            st.caption(f"{live_events:,} events processed")
+
+        live_kpi_cards()
+
+    # --- KPI Trends ---
+    if has_dates:
+        st.header("📆 KPI Trends")
+
+        # Cached per non-date filter selection; the date range only slices it
+        windowed = load_windowed_kpis(tuple(selected_campaigns), tuple(selected_audiences),
+                                      tuple(selected_age_groups), tuple(geos))
 
+        col1, col2 = st.columns(2)
+        with col1:
+            granularity = st.selectbox("Granularity", ["Daily", "Weekly", "7-Day Rolling", "28-Day Rolling"])
+        with col2:
+            trend_metric = st.selectbox("Trend Metric", KPI_COLUMNS)
+
+        if granularity == "Daily":
+            trend_df = windowed.daily(*date_range)
+        elif granularity == "Weekly":
+            trend_df = windowed.weekly(*date_range)
+        else:
+            trend_df = windowed.rolling(int(granularity.split('-')[0]), *date_range)
+
+        fig_trend = px.line(
+            trend_df,
+            x=DATE_COLUMN,
+            y=trend_metric,
+            color='campaign ID',
+            markers=True,
+            title=f"{granularity} {trend_metric} by Campaign"
+        )
+        apply_custom_layout(fig_trend, xaxis_label="Date", yaxis_label=trend_metric, update_trace=False)
+        st.plotly_chart(compact_figure(fig_trend), use_container_width=True)
+
+        st.subheader("Selected Date Range by Campaign")
+        st.dataframe(windowed.window(*date_range).style.format({
+            'Amount Spent': '${:,.2f}',
+            'Impressions': '{:,.0f}',
+            'Clicks': '{:,.0f}',
+            'Unique Link Clicks (ULC)': '{:,.0f}',
+            'Click-Through Rate (CTR in %)': '{:.2f}',
+            'Cost Per Click (CPC)': '${:.2f}',
+            'Cost per Result (CPR)': '${:.2f}'
+        }))
+
+    # --- Data Quality ---
+    # Quarantined rows come from the load-time report and are always shown;
+    # anomalous cells are scored over the filtered rows, cached per selection
+    quarantined = load_quality_report()['quarantined']
+    anomalies = load_anomalies(tuple(selected_campaigns), tuple(selected_audiences),
+                               tuple(selected_age_groups), tuple(geos),
+                               tuple(date_range) if has_dates else None)
+
+    if len(quarantined) or len(anomalies):
+        st.header("🩺 Data Quality")
+        if len(quarantined):
+            st.warning(f"{len(quarantined):,} rows failed validation when the data was loaded and are excluded from every chart and table.")
+        if len(anomalies):
+            st.info(f"{len(anomalies):,} campaign × age × geography cells in the current selection have outlying metrics (robust z-score and IQR fences agree) or an unexpected zero. They are kept in the analysis; review them below.")
+
+        with st.expander("🔎 Quarantined rows and anomalous cells"):
+            if len(quarantined):
+                st.subheader("Quarantined Rows")
+                st.dataframe(quarantined[['Issue', 'campaign ID', 'Audience', 'Age', 'Geography', 'Impressions',
+                                          'Clicks', 'Unique Link Clicks (ULC)', 'Amount Spent']], hide_index=True)
+            if len(anomalies):
+                st.subheader("Anomalous Cells")
+                st.dataframe(anomalies.style.format({
+                    'Click-Through Rate (CTR in %)': '{:.2f}',
+                    'Cost Per Click (CPC)': '${:.2f}',
+                    'Cost per Result (CPR)': '${:.2f}',
+                    'CPM': '${:.2f}',
+                    'Frequency': '{:.2f}',
+                    'ROI Score': '{:.4f}',
+                    'Max |Robust Z|': '{:.1f}'
+                }), hide_index=True)
 
     # --- Campaign Performance Analysis ---
     st.header("🔍 Campaign Performance Analysis")
     
-    # --- Campaign Efficiency Score (higher is better) ---
-    st.subheader("Campaign Efficiency Score (CTR / CPR)")
-    
     # Aggregate by campaign
-    campaign_efficiency = filtered_df.groupby('campaign ID').agg({
-        'Click-Through Rate (CTR in %)': 'mean',
-        'Cost Per Click (CPC)': 'mean',
-        'Cost per Result (CPR)': 'mean',
-        'Efficiency Score': 'mean',
-        'Amount Spent': 'sum',
-        'Impressions': 'sum',
-        'Clicks': 'sum',
-        'Unique Link Clicks (ULC)': 'sum',
-        'ROI Score': 'mean',
-        'CPM': 'mean'
-    }).reset_index()
+    campaign_efficiency = context['by_campaign'][[
+        'campaign ID', 'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)',
+        'Efficiency Score', 'Amount Spent', 'Impressions', 'Clicks', 'Unique Link Clicks (ULC)',
+        'ROI Score', 'CPM'
+    ]]
     
     # Sort by efficiency score (ascending to show worst performers first)
     campaign_efficiency = campaign_efficiency.sort_values('Efficiency Score')
     
-    # Create bar chart for efficiency
-    fig_efficiency = px.bar(
-        campaign_efficiency,
-        x='campaign ID', 
-        y='Efficiency Score',
-        color='Efficiency Score',
-        color_continuous_scale='RdYlGn',  # Red (bad) to Yellow to Green (good)
-        title='Campaign Efficiency Scores: (CTR / CPR) - (Lower efficiency score shows low performance)',
-        hover_data=['Amount Spent', 'Click-Through Rate (CTR in %)', 'Cost per Result (CPR)'],
-        text = 'Efficiency Score'
+    # Calculate a composite score for each campaign
+    # Lower scores are worse performing campaigns
+    campaign_efficiency['Composite Score'] = composite_score(
+        campaign_efficiency['Efficiency Score'],
+        campaign_efficiency['ROI Score'],
+        campaign_efficiency['Cost per Result (CPR)']
     )
 
-    # Update layout
-    apply_custom_layout(fig_efficiency, xaxis_label="campaign ID", yaxis_label="Efficiency Score")
-    
-    st.plotly_chart(fig_efficiency, use_container_width=True)
-    
-    # --- ROI Analysis ---
-    st.subheader("Return on Investment Analysis (ULC / Spend)")
+    # Create a summary table
+    summary_table = campaign_efficiency.sort_values('Composite Score')[
+        ['campaign ID', 'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)', 
+         'ROI Score', 'Efficiency Score', 'Amount Spent', 'Composite Score']
+    ]
     
-    fig_roi = px.bar(
-        campaign_efficiency.sort_values('ROI Score'),
-        x='campaign ID', 
-        y='ROI Score',
-        color='ROI Score',
-        color_continuous_scale='RdYlGn',  # Red (bad) to Yellow to Green (good)
-        title='Campaign ROI Scores: (ULC / Spend) - (Lower ROI Score shows low performance)',
-        hover_data=['Amount Spent', 'Unique Link Clicks (ULC)', 'Cost per Result (CPR)'],
-        text='ROI Score'
-    )
+    # Rename columns for clarity
+    summary_table = summary_table.rename(columns={
+        'campaign ID': 'Campaign',
+        'Click-Through Rate (CTR in %)': 'CTR (%)',
+        'Cost Per Click (CPC)': 'CPC ($)',
+        'Cost per Result (CPR)': 'CPR ($)',
+        'ROI Score': 'ROI',
+        'Efficiency Score': 'Efficiency',
+        'Amount Spent': 'Spend ($)',
+        'Composite Score': 'Performance Score'
+    })
 
-    # Update layout
-    apply_custom_layout(fig_roi, xaxis_label="campaign ID", yaxis_label="ROI Score")
+    # --- Spend by Geography, Clicks by Audience and Reach by Age aggregates ---
+    spend_geo = context['by_geography']
 
-    st.plotly_chart(fig_roi, use_container_width=True)
-    
-    # --- Cost Analysis ---
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Cost per Click (CPC) Analysis")
+    clicks_audience = context['by_audience']
+
+    # Compare multiple campaigns
+    age_compare_df = context['by_campaign_age'][['campaign ID', 'Age', 'Reach']]
+
+    # --- Figure Builders ---
+    # These charts only depend on the filtered rows, not on any widget further
+    # down the page, so they are built concurrently up front and emitted below
+    # in page order.
+    def build_efficiency_figure():
+        # Create bar chart for efficiency
+        fig_efficiency = px.bar(
+            campaign_efficiency,
+            x='campaign ID', 
+            y='Efficiency Score',
+            color='Efficiency Score',
+            color_continuous_scale='RdYlGn',  # Red (bad) to Yellow to Green (good)
+            title='Campaign Efficiency Scores: (CTR / CPR) - (Lower efficiency score shows low performance)',
+            hover_data=['Amount Spent', 'Click-Through Rate (CTR in %)', 'Cost per Result (CPR)'],
+            text = 'Efficiency Score'
+        )
+
+        # Update layout
+        apply_custom_layout(fig_efficiency, xaxis_label="campaign ID", yaxis_label="Efficiency Score")
+        return fig_efficiency
+
+    def build_roi_figure():
+        fig_roi = px.bar(
+            campaign_efficiency.sort_values('ROI Score'),
+            x='campaign ID', 
+            y='ROI Score',
+            color='ROI Score',
+            color_continuous_scale='RdYlGn',  # Red (bad) to Yellow to Green (good)
+            title='Campaign ROI Scores: (ULC / Spend) - (Lower ROI Score shows low performance)',
+            hover_data=['Amount Spent', 'Unique Link Clicks (ULC)', 'Cost per Result (CPR)'],
+            text='ROI Score'
+        )
+
+        # Update layout
+        apply_custom_layout(fig_roi, xaxis_label="campaign ID", yaxis_label="ROI Score")
+        return fig_roi
+
+    def build_cpc_figure():
         fig_cpc = px.bar(
             campaign_efficiency.sort_values('Cost Per Click (CPC)', ascending=False),
             x='campaign ID', 
@@ -166,11 +340,9 @@ try:
             text = 'Cost Per Click (CPC)'
         )
         apply_custom_layout(fig_cpc, xaxis_label="campaign ID", yaxis_label="Cost Per Click (CPC)")
+        return fig_cpc
 
-        st.plotly_chart(fig_cpc, use_container_width=True)
-    
-    with col2:
-        st.subheader("Cost per Result (CPR) Analysis")
+    def build_cpr_figure():
         fig_cpr = px.bar(
             campaign_efficiency.sort_values('Cost per Result (CPR)', ascending=False),
             x='campaign ID', 
@@ -184,79 +356,233 @@ try:
 
         # Update layout
         apply_custom_layout(fig_cpr, xaxis_label="campaign ID", yaxis_label="Cost per Result (CPR)")
-  
-        st.plotly_chart(fig_cpr, use_container_width=True)
+        return fig_cpr
+
+    def build_bubble_figure():
+        fig_bubble = px.scatter(
+            campaign_efficiency,
+            x='Click-Through Rate (CTR in %)', 
+            y='Cost per Result (CPR)',
+            size='Amount Spent',
+            color='ROI Score',
+            hover_name='campaign ID',
+            text='campaign ID',
+            color_continuous_scale='RdYlGn',
+            title='Performance vs Cost (Bubble Size = Total Spend)',
+            labels={'Click-Through Rate (CTR in %)': 'CTR (%)', 'Cost per Result (CPR)': 'CPR ($)'}
+        )
+        apply_custom_layout(fig_bubble, xaxis_label="Click-Through Rate (CTR in %)", yaxis_label="Cost per Result (CPR)", update_trace=False)
+
+        # Add quadrant lines to identify high cost, low performance campaigns
+        avg_ctr = campaign_efficiency['Click-Through Rate (CTR in %)'].mean()
+        avg_cpr = campaign_efficiency['Cost per Result (CPR)'].mean()
+
+        fig_bubble.add_shape(
+            type='line', line=dict(dash='dash', width=1),
+            x0=avg_ctr, y0=0, x1=avg_ctr, y1=campaign_efficiency['Cost per Result (CPR)'].max()*1.1
+        )
+        fig_bubble.add_shape(
+            type='line', line=dict(dash='dash', width=1),
+            x0=0, y0=avg_cpr, x1=campaign_efficiency['Click-Through Rate (CTR in %)'].max()*1.1, y1=avg_cpr
+        )
+
+        # Add quadrant labels
+        fig_bubble.add_annotation(
+            x=avg_ctr/2, y=avg_cpr/2,
+            text="Low CTR, Low CPR",
+            showarrow=False
+        )
+        fig_bubble.add_annotation(
+            x=avg_ctr*1.5, y=avg_cpr/2,
+            text="High CTR, Low CPR (Best)",
+            showarrow=False
+        )
+        fig_bubble.add_annotation(
+            x=avg_ctr/2, y=avg_cpr*1.5,
+            text="Low CTR, High CPR (Worst)",
+            showarrow=False,
+            font=dict(color="red")
+        )
+        fig_bubble.add_annotation(
+            x=avg_ctr*1.5, y=avg_cpr*1.5,
+            text="High CTR, High CPR",
+            showarrow=False
+        )
+        return fig_bubble
+
+    def build_geo_figure():
+        if len(spend_geo) <= 5:
+            fig_geo = px.pie(
+                spend_geo,
+                values='Amount Spent',
+                names='Geography',
+                title="Spend Distribution Across Geographies",
+                hole=0.4
+            )
+            # fig_geo.update_traces(textposition='inside', textinfo='percent+label')
+        else:
+            fig_geo = px.bar(
+                spend_geo,
+                x='Geography',
+                y='Amount Spent',
+                title="Spend Distribution Across Geographies",
+                color='Amount Spent',
+                color_continuous_scale='Oranges',
+                labels={'Amount Spent': 'Amount ($)', 'Geography': 'Region'}
+            )
+
+        apply_custom_layout(fig_geo, xaxis_label="Geography", yaxis_label="Amount Spent", update_trace=False)
+        return fig_geo
+
+    def build_clicks_figure():
+        fig_clicks = px.bar(
+            clicks_audience,
+            x='Audience',
+            y='Clicks',
+            color='Clicks',
+            color_continuous_scale='Blues',
+            title="Total Clicks by Audience Group",
+            labels={'Clicks': 'Number of Clicks', 'Audience': 'Audience Group'}
+        )
+
+        apply_custom_layout(fig_clicks, xaxis_label="Audience Group", yaxis_label="Clicks", update_trace=False)
+        return fig_clicks
+
+    def build_compare_figure():
+        fig_compare = px.bar(
+            age_compare_df,
+            x='Age',
+            y='Reach',
+            color='campaign ID',
+            barmode='group',
+            title="Reach by Age Group Across Campaigns",
+            labels={'Reach': 'Reach Count', 'Age': 'Age Group', 'campaign ID': 'Campaign'}
+        )
+
+        apply_custom_layout(fig_compare, xaxis_label="Age Group", yaxis_label="Reach", update_trace=False)
+        return fig_compare
+
+    def build_perf_figure():
+        fig_perf = px.bar(
+            summary_table.sort_values('Performance Score', ascending=True),  # ascending for horizontal bars
+            x='Performance Score',
+            y='Campaign',
+            orientation='h',
+            color='Performance Score',
+            color_continuous_scale='RdYlGn',
+            title="Campaigns Ranked by Performance Score",
+            labels={'Performance Score': 'Score', 'Campaign': 'campaign ID'},
+            text='Performance Score'
+        )
+
+        apply_custom_layout(fig_perf, xaxis_label="Performance Score", yaxis_label="campaign ID")
+        return fig_perf
+
+    def build_radar_figure():
+        # Prepare radar chart data
+        categories = summary_table['Campaign'].tolist()
+        scores = summary_table['Performance Score'].tolist()
+
+        # Radar charts require the first and last point to be the same to close the loop
+        categories.append(categories[0])
+        scores.append(scores[0])
+
+        # Create radar chart
+        fig_radar = go.Figure(
+            data=go.Scatterpolar(
+                r=scores,
+                theta=categories,
+                fill='toself',
+                name='Performance Score',
+                marker=dict(color='green'),
+                text=[f'{s:.4f}' for s in scores],
+                hoverinfo='text+theta'
+            )
+        )
+
+        # fig_radar.update_layout(
+        #     polar=dict(
+        #         radialaxis=dict(
+        #             visible=True,
+        #             range=[0, max(scores) * 1.1]
+        #         ),
+        #     ),
+        #     showlegend=False,
+        #     title="Campaign Performance Radar Chart",
+        #     height=600
+        # )
+
+        # Apply the same custom layout styling
+        apply_custom_layout(fig_radar, xaxis_label="", yaxis_label="", update_trace=False)
+        return fig_radar
+
+    figures = build_figures({
+        'efficiency': build_efficiency_figure,
+        'roi': build_roi_figure,
+        'cpc': build_cpc_figure,
+        'cpr': build_cpr_figure,
+        'bubble': build_bubble_figure,
+        'geo': build_geo_figure,
+        'clicks': build_clicks_figure,
+        'compare': build_compare_figure,
+        'perf': build_perf_figure,
+        'radar': build_radar_figure,
+    })
+
+    # --- Campaign Efficiency Score (higher is better) ---
+    st.subheader("Campaign Efficiency Score (CTR / CPR)")
+
+    st.plotly_chart(figures['efficiency'], use_container_width=True)
     
-    # --- Performance vs Spend Analysis ---
-    st.subheader("Performance vs Spend Analysis")
+    # --- ROI Analysis ---
+    st.subheader("Return on Investment Analysis (ULC / Spend)")
     
-    fig_bubble = px.scatter(
-        campaign_efficiency,
-        x='Click-Through Rate (CTR in %)', 
-        y='Cost per Result (CPR)',
-        size='Amount Spent',
-        color='ROI Score',
-        hover_name='campaign ID',
-        text='campaign ID',
-        color_continuous_scale='RdYlGn',
-        title='Performance vs Cost (Bubble Size = Total Spend)',
-        labels={'Click-Through Rate (CTR in %)': 'CTR (%)', 'Cost per Result (CPR)': 'CPR ($)'}
-    )
-    apply_custom_layout(fig_bubble, xaxis_label="Click-Through Rate (CTR in %)", yaxis_label="Cost per Result (CPR)", update_trace=False)
-
-    # Add quadrant lines to identify high cost, low performance campaigns
-    avg_ctr = campaign_efficiency['Click-Through Rate (CTR in %)'].mean()
-    avg_cpr = campaign_efficiency['Cost per Result (CPR)'].mean()
+    st.plotly_chart(figures['roi'], use_container_width=True)
     
-    fig_bubble.add_shape(
-        type='line', line=dict(dash='dash', width=1),
-        x0=avg_ctr, y0=0, x1=avg_ctr, y1=campaign_efficiency['Cost per Result (CPR)'].max()*1.1
-    )
-    fig_bubble.add_shape(
-        type='line', line=dict(dash='dash', width=1),
-        x0=0, y0=avg_cpr, x1=campaign_efficiency['Click-Through Rate (CTR in %)'].max()*1.1, y1=avg_cpr
-    )
+    # --- Cost Analysis ---
+    col1, col2 = st.columns(2)
     
-    # Add quadrant labels
-    fig_bubble.add_annotation(
-        x=avg_ctr/2, y=avg_cpr/2,
-        text="Low CTR, Low CPR",
-        showarrow=False
-    )
-    fig_bubble.add_annotation(
-        x=avg_ctr*1.5, y=avg_cpr/2,
-        text="High CTR, Low CPR (Best)",
-        showarrow=False
-    )
-    fig_bubble.add_annotation(
-        x=avg_ctr/2, y=avg_cpr*1.5,
-        text="Low CTR, High CPR (Worst)",
-        showarrow=False,
-        font=dict(color="red")
-    )
-    fig_bubble.add_annotation(
-        x=avg_ctr*1.5, y=avg_cpr*1.5,
-        text="High CTR, High CPR",
-        showarrow=False
-    )
+    with col1:
+        st.subheader("Cost per Click (CPC) Analysis")
+        st.plotly_chart(figures['cpc'], use_container_width=True)
     
-    st.plotly_chart(fig_bubble, use_container_width=True)
+    with col2:
+        st.subheader("Cost per Result (CPR) Analysis")
+        st.plotly_chart(figures['cpr'], use_container_width=True)
+    
+    # --- Performance vs Spend Analysis ---
+    st.subheader("Performance vs Spend Analysis")
+    
+    st.plotly_chart(figures['bubble'], use_container_width=True)
     
     # --- Campaign to Discontinue Recommendation ---
     st.header("🚫 Campaign Discontinuation Recommendation")
     
-    # Calculate a composite score for each campaign
-    # Lower scores are worse performing campaigns
-    campaign_efficiency['Composite Score'] = (
-        (campaign_efficiency['Efficiency Score'] / campaign_efficiency['Efficiency Score'].max()) * 0.4 +
-        (campaign_efficiency['ROI Score'] / campaign_efficiency['ROI Score'].max()) * 0.4 +
-        (1 - (campaign_efficiency['Cost per Result (CPR)'] / campaign_efficiency['Cost per Result (CPR)'].max())) * 0.2
-    )
-    
     # Get the worst performing campaign
     worst_campaign = campaign_efficiency.sort_values('Composite Score').iloc[0]
     
     st.subheader(f"Recommended Campaign to Discontinue: {worst_campaign['campaign ID']}")
+
+    # How often the campaign stays last when click and result rates are resampled;
+    # cached per sidebar filter selection like the KPI trends
+    score_intervals = load_bootstrap_scores(tuple(selected_campaigns), tuple(selected_audiences),
+                                            tuple(selected_age_groups), tuple(geos),
+                                            tuple(date_range) if has_dates else None)
+    worst_interval = score_intervals.set_index('campaign ID').loc[worst_campaign['campaign ID']]
+    confidence = worst_interval['P(Worst)']
+
+    if pd.isna(confidence):
+        st.info("Not enough data to gauge confidence: the selection has no spend or results to resample.")
+    elif confidence >= 0.8:
+        st.success(f"High confidence: ranked worst in {confidence:.0%} of resamples")
+    elif confidence >= 0.5:
+        st.warning(f"Moderate confidence: ranked worst in {confidence:.0%} of resamples")
+    else:
+        others = score_intervals[score_intervals['campaign ID'] != worst_campaign['campaign ID']]
+        runner_up = others.sort_values('P(Worst)', ascending=False).iloc[0]
+        st.error(f"Low confidence: ranked worst in only {confidence:.0%} of resamples "
+                 f"({runner_up['campaign ID']} is worst in {runner_up['P(Worst)']:.0%}). "
+                 "Gather more data before discontinuing.")
     
     # Create a metrics explanation card
     col1, col2 = st.columns(2)
@@ -272,6 +598,9 @@ try:
         st.write(f"Impressions: {worst_campaign['Impressions']:,}")
         st.write(f"Clicks: {worst_campaign['Clicks']:,}")
         st.write(f"Unique Link Clicks: {worst_campaign['Unique Link Clicks (ULC)']:,}")
+        st.write(f"CTR 95% interval: {worst_interval['CTR Low']:.2f}% – {worst_interval['CTR High']:.2f}%")
+        st.write(f"ROI 95% interval: {worst_interval['ROI Low']:.4f} – {worst_interval['ROI High']:.4f}")
+        st.write(f"Composite 95% interval: {worst_interval['Composite Low']:.4f} – {worst_interval['Composite High']:.4f}")
     
     with col2:
         st.warning("Recommendation Reasoning")
@@ -285,7 +614,92 @@ try:
         The low composite score indicates poor performance across these key metrics,
         suggesting budget could be better allocated to higher-performing campaigns.
         """)
-                
+
+    with st.expander("Score uncertainty for all campaigns"):
+        st.write("95% intervals from resampling each row's click and result rates; "
+                 "P(Worst) is the share of resamples in which the campaign scores lowest.")
+        st.dataframe(score_intervals.sort_values('P(Worst)', ascending=False).style.format({
+            'CTR Low': '{:.2f}',
+            'CTR High': '{:.2f}',
+            'ROI Low': '{:.4f}',
+            'ROI High': '{:.4f}',
+            'Composite Low': '{:.4f}',
+            'Composite High': '{:.4f}',
+            'P(Worst)': '{:.1%}'
+        }))
+
+    # --- Budget Reallocation ---
+    st.header("💰 Budget Reallocation")
+    st.write("Models each campaign × age × geography cell with a diminishing-returns curve (results = scale × spend^elasticity) "
+             "and finds the split of the budget that maximises projected unique link clicks. A cell's elasticity is fitted "
+             "when it was observed at several spend levels (e.g. one row per day); other cells share the slope pooled "
+             "within the fitted cells.")
+
+    current_budget = float(filtered_df['Amount Spent'].sum())
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        budget = st.number_input("Budget ($)", min_value=0.0, value=current_budget, step=100.0)
+    with col2:
+        min_share = st.slider("Minimum Spend per Cell (% of current)", 0, 100, 50) / 100
+    with col3:
+        max_share = st.slider("Maximum Spend per Cell (× current)", 1.0, 5.0, 3.0, step=0.5)
+
+    curves = fit_response_curves(filtered_df)
+    curves_assumed = curves_are_assumed(curves)
+    if curves_assumed:
+        if (curves['Elasticity Source'] == 'Assumed').all():
+            reason = ("No cell was observed at more than one spend level, so every curve uses an assumed "
+                      f"elasticity of {DEFAULT_ELASTICITY}")
+        else:
+            reason = ("The slope pooled within the fitted cells fell outside the "
+                      f"{MIN_ELASTICITY}-{MAX_ELASTICITY} elasticity bounds and was clipped to one of them")
+        st.warning(f"{reason}: the curves are assumed, not fitted. The allocation only ranks cells by their "
+                   "current results per dollar, and the projected uplift reflects the assumption rather than the data.")
+    else:
+        sources = curves['Elasticity Source'].value_counts()
+        st.caption(f"Elasticity fitted for {sources.get('Fitted', 0)} cells and pooled for {sources.get('Pooled', 0)}; "
+                   f"{int(curves['Elasticity Clipped'].sum())} clipped to the {MIN_ELASTICITY}-{MAX_ELASTICITY} bounds.")
+
+    try:
+        allocation = optimize_allocation(curves, budget, min_share, max_share)
+    except ValueError as e:
+        st.warning(str(e))
+    else:
+        reallocation = summarize_allocation(allocation)
+        current_results = reallocation['Current Results'].sum()
+        projected_results = reallocation['Projected Results'].sum()
+
+        col1, col2 = st.columns(2)
+        col1.metric("Current Unique Link Clicks", f"{current_results:,.0f}")
+        if curves_assumed:
+            # An uplift from assumed curves would read as a forecast, so it is not shown
+            col2.metric("Projected Unique Link Clicks (assumed curves)", f"{projected_results:,.0f}")
+        else:
+            col2.metric("Projected Unique Link Clicks", f"{projected_results:,.0f}",
+                        delta=f"{(projected_results / current_results - 1) if current_results else 0:.1%}")
+
+        fig_realloc = px.bar(
+            reallocation.melt(id_vars='campaign ID', value_vars=['Current Spend', 'Optimal Spend'],
+                              var_name='Allocation', value_name='Spend'),
+            x='campaign ID',
+            y='Spend',
+            color='Allocation',
+            barmode='group',
+            title="Current vs Optimal Spend by Campaign"
+        )
+        apply_custom_layout(fig_realloc, xaxis_label="campaign ID", yaxis_label="Spend", update_trace=False)
+        st.plotly_chart(compact_figure(fig_realloc), use_container_width=True)
+
+        st.dataframe(reallocation.sort_values('Spend Change').style.format({
+            'Current Spend': '${:,.2f}',
+            'Optimal Spend': '${:,.2f}',
+            'Spend Change': '${:+,.2f}',
+            'Current Results': '{:,.0f}',
+            'Projected Results': '{:,.0f}',
+            'Current Score': '{:.4f}',
+            'Projected Score': '{:.4f}'
+        }))
+
     # --- Reach & Impressions Line Chart ---
     st.header("📈 Reach and Impressions Analysis")
 
@@ -293,12 +707,7 @@ try:
     all_age_groups = sorted(filtered_df['Age'].dropna().unique())
 
     # Group and pivot for consistent age groups across campaigns
-    reach_impressions_df = (
-            filtered_df
-            .groupby(['campaign ID', 'Age'])[['Reach', 'Impressions']]
-            .sum()
-            .reset_index()
-        )
+    reach_impressions_df = context['by_campaign_age']
 
     # Add missing age groups for each campaign with 0 values
     campaign_age_grid = pd.MultiIndex.from_product(
@@ -344,35 +753,12 @@ try:
     )
 
     apply_custom_layout(fig_line, xaxis_label="Age Group", yaxis_label="Count", update_trace=False)
-    st.plotly_chart(fig_line, use_container_width=True)
+    st.plotly_chart(compact_figure(fig_line), use_container_width=True)
 
     # --- Spend Distribution by Geography ---
     st.header("🌍 Spend Distribution by Geography")
 
-    spend_geo = filtered_df.groupby('Geography')['Amount Spent'].sum().reset_index()
-
-    if len(spend_geo) <= 5:
-            fig_geo = px.pie(
-                spend_geo,
-                values='Amount Spent',
-                names='Geography',
-                title="Spend Distribution Across Geographies",
-                hole=0.4
-            )
-            # fig_geo.update_traces(textposition='inside', textinfo='percent+label')
-    else:
-            fig_geo = px.bar(
-                spend_geo,
-                x='Geography',
-                y='Amount Spent',
-                title="Spend Distribution Across Geographies",
-                color='Amount Spent',
-                color_continuous_scale='Oranges',
-                labels={'Amount Spent': 'Amount ($)', 'Geography': 'Region'}
-            )
-
-    apply_custom_layout(fig_geo, xaxis_label="Geography", yaxis_label="Amount Spent", update_trace=False)
-    st.plotly_chart(fig_geo, use_container_width=True)
+    st.plotly_chart(figures['geo'], use_container_width=True)
 
     # # --- Spend Distribution by Geography (Map) ---
     # st.header("🗺️ Spend Distribution by Geography (Map View)")
@@ -400,20 +786,7 @@ try:
     # --- Clicks by Audience ---
     st.header("🧑‍🤝‍🧑 Clicks by Audience")
 
-    clicks_audience = filtered_df.groupby('Audience')['Clicks'].sum().reset_index()
-
-    fig_clicks = px.bar(
-            clicks_audience,
-            x='Audience',
-            y='Clicks',
-            color='Clicks',
-            color_continuous_scale='Blues',
-            title="Total Clicks by Audience Group",
-            labels={'Clicks': 'Number of Clicks', 'Audience': 'Audience Group'}
-        )
-
-    apply_custom_layout(fig_clicks, xaxis_label="Audience Group", yaxis_label="Clicks", update_trace=False)
-    st.plotly_chart(fig_clicks, use_container_width=True)
+    st.plotly_chart(figures['clicks'], use_container_width=True)
 
             
     # --- Detailed Campaign Analysis ---
@@ -451,7 +824,7 @@ try:
         )
 
         apply_custom_layout(fig_age_ctr, xaxis_label="Age Group", yaxis_label="CTR (%)", update_trace=False)
-        st.plotly_chart(fig_age_ctr, use_container_width=True)
+        st.plotly_chart(compact_figure(fig_age_ctr), use_container_width=True)
     
     with col2:
         fig_age_cpr = px.bar(
@@ -463,7 +836,7 @@ try:
             title=f'CPR by Age Group for {selected_campaign}'
         )
         apply_custom_layout(fig_age_cpr, xaxis_label="Age Group", yaxis_label="Cost per Result (CPR)")
-        st.plotly_chart(fig_age_cpr, use_container_width=True)
+        st.plotly_chart(compact_figure(fig_age_cpr), use_container_width=True)
     
     # Geography analysis
     if 'Geography' in campaign_data.columns:
@@ -489,7 +862,7 @@ try:
                 title=f'CTR by Geography for {selected_campaign}'
             )
             apply_custom_layout(fig_geo_ctr, xaxis_label="Geography", yaxis_label="CTR (%)")
-            st.plotly_chart(fig_geo_ctr, use_container_width=True)
+            st.plotly_chart(compact_figure(fig_geo_ctr), use_container_width=True)
         
         with col2:
             fig_geo_cpr = px.bar(
@@ -501,7 +874,7 @@ try:
                 title=f'CPR by Geography for {selected_campaign}'
             )
             apply_custom_layout(fig_geo_cpr, xaxis_label="Geography", yaxis_label="Cost per Result (CPR)")
-            st.plotly_chart(fig_geo_cpr, use_container_width=True)
+            st.plotly_chart(compact_figure(fig_geo_cpr), use_container_width=True)
     
 
     # --- Age Distribution by Campaign ---
@@ -529,30 +902,11 @@ try:
     )
 
     apply_custom_layout(fig_age_dist, xaxis_label="Age Group", yaxis_label="Count", update_trace=False)
-    st.plotly_chart(fig_age_dist, use_container_width=True)
+    st.plotly_chart(compact_figure(fig_age_dist), use_container_width=True)
 
     st.subheader("🎯 Comparision of Age Distribution by Campaign")
     st.write("This section compares the reach of different campaigns across various age groups.")
-    # Compare multiple campaigns
-    age_compare_df = (
-        filtered_df
-        .groupby(['campaign ID', 'Age'])[['Reach']]
-        .sum()
-        .reset_index()
-    )
-
-    fig_compare = px.bar(
-        age_compare_df,
-        x='Age',
-        y='Reach',
-        color='campaign ID',
-        barmode='group',
-        title="Reach by Age Group Across Campaigns",
-        labels={'Reach': 'Reach Count', 'Age': 'Age Group', 'campaign ID': 'Campaign'}
-    )
-
-    apply_custom_layout(fig_compare, xaxis_label="Age Group", yaxis_label="Reach", update_trace=False)
-    st.plotly_chart(fig_compare, use_container_width=True)
+    st.plotly_chart(figures['compare'], use_container_width=True)
 
     
     # --- Comparative Analysis ---
@@ -634,28 +988,44 @@ try:
     
     comparison_df = pd.DataFrame(comparison_data)
     st.dataframe(comparison_df)
+    render_export_buttons("campaign_comparison", comparison_df)
+
+    # --- Segment Drill-Down ---
+    st.header("🧩 Segment Drill-Down")
+    st.write("Compare every combination of the chosen dimensions side by side, within the current filters.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        segment_dimensions = st.multiselect("Segment by", SEGMENT_COLUMNS, default=['Audience', 'Age'])
+    with col2:
+        custom_geos = st.multiselect("Custom geography group", sorted(filtered_df['Geography'].unique()))
+
+    segments = cross_segments(filtered_df, segment_dimensions) if segment_dimensions else {}
+    if custom_geos:
+        segments[f"Geography group ({len(custom_geos)})"] = {'Geography': custom_geos}
+
+    if segments:
+        # All segments in one pass over the filtered rows
+        segment_matrix = evaluate_segments(filtered_df, segments).sort_values('Composite Score', ascending=False)
+        st.dataframe(segment_matrix.style.format({
+            'Amount Spent': '${:,.2f}',
+            'Impressions': '{:,.0f}',
+            'Clicks': '{:,.0f}',
+            'Unique Link Clicks (ULC)': '{:,.0f}',
+            'Click-Through Rate (CTR in %)': '{:.2f}',
+            'Cost Per Click (CPC)': '${:.2f}',
+            'Cost per Result (CPR)': '${:.2f}',
+            'Efficiency Score': '{:.4f}',
+            'ROI Score': '{:.4f}',
+            'Composite Score': '{:.4f}'
+        }).background_gradient(subset=['Composite Score'], cmap='RdYlGn'), hide_index=True)
+        render_export_buttons("segment_comparison", segment_matrix)
+    else:
+        st.info("Choose at least one dimension or a custom geography group to compare segments.")
     
     # --- Campaign Performance Table ---
     st.header("📋 Campaign Performance Summary")
     
-    # Create a summary table
-    summary_table = campaign_efficiency.sort_values('Composite Score')[
-        ['campaign ID', 'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)', 
-         'ROI Score', 'Efficiency Score', 'Amount Spent', 'Composite Score']
-    ]
-    
-    # Rename columns for clarity
-    summary_table = summary_table.rename(columns={
-        'campaign ID': 'Campaign',
-        'Click-Through Rate (CTR in %)': 'CTR (%)',
-        'Cost Per Click (CPC)': 'CPC ($)',
-        'Cost per Result (CPR)': 'CPR ($)',
-        'ROI Score': 'ROI',
-        'Efficiency Score': 'Efficiency',
-        'Amount Spent': 'Spend ($)',
-        'Composite Score': 'Performance Score'
-    })
-    
     # Format the table
     st.dataframe(summary_table.style.format({
         'CTR (%)': '{:.2f}',
@@ -666,24 +1036,12 @@ try:
         'Spend ($)': '${:.2f}',
         'Performance Score': '{:.4f}'
     }).background_gradient(subset=['Performance Score'], cmap='RdYlGn'))
+    render_export_buttons("campaign_summary", summary_table)
 
    # --- Campaign Performance Visualization ---
     st.subheader("📊 Visual Campaign Performance Comparison")
 
-    fig_perf = px.bar(
-        summary_table.sort_values('Performance Score', ascending=True),  # ascending for horizontal bars
-        x='Performance Score',
-        y='Campaign',
-        orientation='h',
-        color='Performance Score',
-        color_continuous_scale='RdYlGn',
-        title="Campaigns Ranked by Performance Score",
-        labels={'Performance Score': 'Score', 'Campaign': 'campaign ID'},
-        text='Performance Score'
-    )
-
-    apply_custom_layout(fig_perf, xaxis_label="Performance Score", yaxis_label="campaign ID")
-    st.plotly_chart(fig_perf, use_container_width=True)
+    st.plotly_chart(figures['perf'], use_container_width=True)
 
     # Basic_additional_visuals
     st.subheader("📊 Additional Visualizations")
@@ -692,46 +1050,10 @@ try:
     # --- Radar Chart: Campaign Performance ---
     st.subheader("🕸️ Radar Chart of Campaign Performance")
 
-    # Prepare radar chart data
-    categories = summary_table['Campaign'].tolist()
-    scores = summary_table['Performance Score'].tolist()
-
-    # Radar charts require the first and last point to be the same to close the loop
-    categories.append(categories[0])
-    scores.append(scores[0])
-
-    # Create radar chart
-    fig_radar = go.Figure(
-        data=go.Scatterpolar(
-            r=scores,
-            theta=categories,
-            fill='toself',
-            name='Performance Score',
-            marker=dict(color='green'),
-            text=[f'{s:.4f}' for s in scores],
-            hoverinfo='text+theta'
-        )
-    )
-
-    # fig_radar.update_layout(
-    #     polar=dict(
-    #         radialaxis=dict(
-    #             visible=True,
-    #             range=[0, max(scores) * 1.1]
-    #         ),
-    #     ),
-    #     showlegend=False,
-    #     title="Campaign Performance Radar Chart",
-    #     height=600
-    # )
-
-    # Apply the same custom layout styling
-    apply_custom_layout(fig_radar, xaxis_label="", yaxis_label="", update_trace=False)
-
     # Display in Streamlit
-    st.plotly_chart(fig_radar, use_container_width=True)
+    st.plotly_chart(figures['radar'], use_container_width=True)
     
-    additional_visualizations(filtered_df)
+    additional_visualizations(context)
  
     st.markdown("---")
     st.caption("Campaign Analysis Tool - Prioritize campaigns with higher Performance Scores")
@@ -0,0 +1,10 @@
+# --- Key Columns ---
+# Row keys shared by the load-time quality stage, the budget optimizer and
+# the segment engine. Kept free of imports so any module can use them.
+
+# Every segment a row belongs to
+SEGMENT_COLUMNS = ['campaign ID', 'Audience', 'Age', 'Geography']
+
+# Campaign x age x geography cells: budget is reallocated between them and
+# anomalies are scored per cell
+CELL_COLUMNS = ['campaign ID', 'Age', 'Geography']
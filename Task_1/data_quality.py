@@ -0,0 +1,113 @@
+# --- Data Quality ---
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from columns import CELL_COLUMNS, SEGMENT_COLUMNS
+
+COUNT_COLUMNS = ['Reach', 'Impressions', 'Clicks', 'Unique Link Clicks (ULC)', 'Amount Spent']
+
+# Cell metrics checked for outliers, each a ratio of one CELL_COLUMNS cell's sums
+ANOMALY_METRICS = [
+    'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)',
+    'CPM', 'Frequency', 'ROI Score',
+]
+
+# A metric that is exactly zero (no clicks, or spend with no results) has no
+# log, so zeros are their own check: flagged when fewer than half the cells
+# share it, i.e. when the metric's median is positive
+#
+# Otherwise a metric is flagged only when both tests agree: |robust z| above this
+# (Iglewicz & Hoaglin's cut-off) and beyond Tukey's fences at this many IQRs
+# outside the quartiles. Either alone over-flags tight or bimodal metrics.
+ROBUST_Z_THRESHOLD = 3.5
+IQR_FENCE = 1.5
+
+# Row checks whose failures are quarantined: rows that cannot be analysed at
+# all or whose counts contradict each other
+QUARANTINE_RULES = {
+    'Missing segment': lambda df: df[SEGMENT_COLUMNS].isna().any(axis=1),
+    'Missing or negative count': lambda df: (df[COUNT_COLUMNS].isna() | (df[COUNT_COLUMNS] < 0)).any(axis=1),
+    'No impressions': lambda df: df['Impressions'] == 0,
+    'Clicks exceed impressions': lambda df: df['Clicks'] > df['Impressions'],
+    'Results exceed clicks': lambda df: df['Unique Link Clicks (ULC)'] > df['Clicks'],
+}
+
+
+def quarantine_rows(df: pd.DataFrame):
+    # Split off the rows failing any QUARANTINE_RULES check. The quarantined
+    # rows keep every column plus an 'Issue' listing the checks they failed.
+    failures = pd.DataFrame({name: rule(df) for name, rule in QUARANTINE_RULES.items()}, index=df.index)
+    bad = failures.any(axis=1)
+
+    quarantined = df[bad].copy()
+    issues = failures[bad]
+    quarantined['Issue'] = [
+        '; '.join(issues.columns[row]) for row in issues.to_numpy()
+    ]
+    return df[~bad], quarantined
+
+
+def cell_metrics(df: pd.DataFrame):
+    # Metrics per cell from summed counts; zero denominators give NaN
+    cells = df.groupby(CELL_COLUMNS, sort=False)[COUNT_COLUMNS].sum()
+    metrics = pd.DataFrame(index=cells.index)
+    spend = cells['Amount Spent']
+    metrics['Click-Through Rate (CTR in %)'] = cells['Clicks'] / cells['Impressions'].replace(0, np.nan) * 100
+    metrics['Cost Per Click (CPC)'] = spend / cells['Clicks'].replace(0, np.nan)
+    metrics['Cost per Result (CPR)'] = spend / cells['Unique Link Clicks (ULC)'].replace(0, np.nan)
+    metrics['CPM'] = spend / cells['Impressions'].replace(0, np.nan) * 1000
+    metrics['Frequency'] = cells['Impressions'] / cells['Reach'].replace(0, np.nan)
+    metrics['ROI Score'] = cells['Unique Link Clicks (ULC)'] / spend.replace(0, np.nan)
+    return metrics
+
+
+def score_anomalies(df: pd.DataFrame):
+    # Robust z-scores and IQR fences for every metric of every cell, as whole
+    # cells x metrics array operations. Rates and costs are right-skewed, so
+    # both are taken on the log scale, where a cell spending 5x the typical CPR
+    # is as unusual as one spending a fifth of it. Medians and quartiles come
+    # from selection rather than sorting, so the pass stays linear in the
+    # number of cells. Zero metrics are flagged by their own check (see
+    # above) and listed with a "(zero)" suffix. Returns the flagged cells,
+    # zeros first, then the most extreme.
+    metrics = cell_metrics(df)
+    if metrics.empty:
+        return metrics.assign(**{'Max |Robust Z|': 0.0, 'Flagged Metrics': ''}).reset_index()
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # A metric with no defined values (e.g. no Reach anywhere) is all-NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        values = np.log(metrics.where(metrics > 0).to_numpy(dtype=float))
+
+        median = np.nanmedian(values, axis=0)
+        mad = np.nanmedian(np.abs(values - median), axis=0)
+        z = np.where(mad > 0, 0.6745 * (values - median) / mad, np.nan)
+
+        q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+        iqr = q3 - q1
+        outside = (values < q1 - IQR_FENCE * iqr) | (values > q3 + IQR_FENCE * iqr)
+
+    raw = metrics.to_numpy(dtype=float)
+    zeros = (raw == 0) & (metrics.median() > 0).to_numpy()
+    flags = ((np.abs(z) > ROBUST_Z_THRESHOLD) & outside) | zeros
+    flagged = flags.any(axis=1)
+
+    anomalies = metrics[flagged].copy()
+    anomalies['Max |Robust Z|'] = np.abs(np.nan_to_num(z[flagged])).max(axis=1, initial=0)
+    anomalies['Flagged Metrics'] = [
+        ', '.join(f"{column} (zero)" if zero else column
+                  for column, flag, zero in zip(metrics.columns, flag_row, zero_row) if flag)
+        for flag_row, zero_row in zip(flags[flagged], zeros[flagged])
+    ]
+    anomalies['Zero'] = zeros[flagged].any(axis=1)
+    return (anomalies.sort_values(['Zero', 'Max |Robust Z|'], ascending=False)
+            .drop(columns='Zero').reset_index())
+
+
+def assess_data_quality(df: pd.DataFrame):
+    # Load-time quality stage: the rows fit for analysis, plus a report of the
+    # quarantined rows and the anomalous cells among the rows that were kept
+    clean, quarantined = quarantine_rows(df)
+    return clean, {'quarantined': quarantined, 'anomalies': score_anomalies(clean)}
@@ -0,0 +1,173 @@
+# --- Export ---
+import io
+import os
+import tempfile
+
+import pandas as pd
+
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'XLSX': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Rows serialized at a time; only one chunk's encoding is held in memory
+EXPORT_CHUNK_ROWS = 100_000
+# Bytes read at a time when streaming a finished file back from disk
+READ_BLOCK_BYTES = 1024 * 1024
+# Excel's sheet limit is 1,048,576 rows; one of them is the header
+XLSX_SHEET_ROWS = 1_048_575
+# Largest estimated export offered as a browser download. st.download_button
+# holds the whole file in memory and copies it into Streamlit's media store,
+# so larger exports go to disk through write_export / `python exports.py`.
+MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+# Rows encoded to estimate an export's size
+SIZE_SAMPLE_ROWS = 1_000
+
+
+def _chunks(df: pd.DataFrame, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows=EXPORT_CHUNK_ROWS):
+    yield df.iloc[:0].to_csv(index=False).encode()
+    for chunk in _chunks(df, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode()
+
+
+class _DrainSink(io.RawIOBase):
+    # Write-only file object that keeps what was written since the last drain(),
+    # so a Parquet writer's output can be handed on one row group at a time
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data, self.buffer = bytes(self.buffer), bytearray()
+        return data
+
+
+def iter_parquet(df: pd.DataFrame, chunk_rows=EXPORT_CHUNK_ROWS):
+    # One row group per chunk; the schema comes from the first chunk so object
+    # columns keep their inferred types
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _DrainSink()
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_xlsx(df: pd.DataFrame, chunk_rows=EXPORT_CHUNK_ROWS):
+    # XLSX is a zip archive that can only be finished once every row is in, so
+    # rows go through xlsxwriter's constant-memory mode (each row is flushed to
+    # a temporary file as soon as it is written) and the finished workbook is
+    # streamed back from disk. Frames longer than one sheet continue on the next.
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                              'default_date_format': 'yyyy-mm-dd'})
+        header = [str(column) for column in df.columns]
+        sheet_starts = range(0, max(len(df), 1), XLSX_SHEET_ROWS)
+        for number, sheet_start in enumerate(sheet_starts, start=1):
+            worksheet = workbook.add_worksheet('Data' if len(sheet_starts) == 1 else f'Data {number}')
+            worksheet.write_row(0, 0, header)
+            row = 1
+            for chunk in _chunks(df.iloc[sheet_start:sheet_start + XLSX_SHEET_ROWS], chunk_rows):
+                # Missing values become blank cells
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                for values in chunk.itertuples(index=False, name=None):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+        workbook.close()
+
+        with open(path, 'rb') as f:
+            while block := f.read(READ_BLOCK_BYTES):
+                yield block
+    finally:
+        os.remove(path)
+
+
+EXPORT_WRITERS = {
+    'CSV': iter_csv,
+    'Parquet': iter_parquet,
+    'XLSX': iter_xlsx,
+}
+
+
+def iter_export(df: pd.DataFrame, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Byte chunks of `df` encoded as `fmt`; concatenated, they are the file
+    if fmt not in EXPORT_WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return EXPORT_WRITERS[fmt](df, chunk_rows)
+
+
+def export_file(df: pd.DataFrame, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    # The export as an in-memory file for st.download_button, which keeps the
+    # finished file in its media store anyway; only the encoded file is held,
+    # never an encoded copy of the whole frame next to it. Exports too large for
+    # that go through write_export (or iter_export) instead.
+    buffer = io.BytesIO()
+    for block in iter_export(df, fmt, chunk_rows):
+        buffer.write(block)
+    buffer.seek(0)
+    return buffer
+
+
+def estimate_export_bytes(df: pd.DataFrame, sample_rows=SIZE_SAMPLE_ROWS):
+    # Size of the CSV export, extrapolated from its first rows without
+    # encoding the rest; Parquet comes out smaller and XLSX about the same
+    if len(df) <= sample_rows:
+        return sum(len(block) for block in iter_csv(df))
+    sample = df.iloc[:sample_rows].to_csv(index=False, header=False).encode()
+    return len(sample) * len(df) // sample_rows
+
+
+def write_export(df: pd.DataFrame, fmt, path, chunk_rows=EXPORT_CHUNK_ROWS):
+    with open(path, 'wb') as out:
+        for block in iter_export(df, fmt, chunk_rows):
+            out.write(block)
+    return path
+
+
+def export_file_name(name, fmt):
+    return f"{name}.{EXPORT_FORMATS[fmt][0]}"
+
+
+def export_mime(fmt):
+    return EXPORT_FORMATS[fmt][1]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from load_data import DATA_PATH, read_campaign_data
+
+    parser = argparse.ArgumentParser(description="Export the cleaned campaign rows")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="CSV")
+    parser.add_argument("--input", default=DATA_PATH)
+    args = parser.parse_args()
+
+    print(write_export(read_campaign_data(args.input), args.format, args.output))
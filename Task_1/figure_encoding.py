@@ -0,0 +1,76 @@
+# --- Compact Figure Encoding ---
+import numbers
+
+import numpy as np
+
+# Per-trace attributes that Plotly Express writes out explicitly even though
+# they match plotly.js defaults, so they only add bytes to every trace
+REDUNDANT_DEFAULTS = {
+    'xaxis': 'x',
+    'yaxis': 'y',
+    'showlegend': True,
+    'marker': {'symbol': 'circle', 'pattern': {'shape': ''}},
+    'line': {'shape': 'linear', 'dash': 'solid'},
+}
+
+
+def compact_array(values):
+    # Turn whole-number float arrays (counts stored as float) into the
+    # narrowest int dtype that holds them, so Plotly's typed-array encoding
+    # ships i1/i2/i4 instead of f8. Plain numeric lists become arrays so they
+    # are base64 encoded rather than written out digit by digit; anything
+    # non-numeric is returned untouched.
+    if isinstance(values, (list, tuple)):
+        if not values or not all(isinstance(v, numbers.Real) and not isinstance(v, bool) for v in values):
+            return values
+        values = np.asarray(values, dtype=float)
+
+    if not isinstance(values, np.ndarray) or not np.issubdtype(values.dtype, np.floating) or not values.size:
+        return values
+
+    if not np.isfinite(values).all() or not np.array_equal(values, np.trunc(values)):
+        return values
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def _compact_props(props, defaults, path=()):
+    # Collect (property path, new value) pairs for one (possibly nested)
+    # property dict; a None value removes the property from the trace
+    updates = []
+    for key, value in props.items():
+        default = defaults.get(key)
+        if isinstance(value, dict):
+            updates += _compact_props(value, default if isinstance(default, dict) else {}, path + (key,))
+        elif default is not None and not isinstance(default, dict) and value == default:
+            updates.append((path + (key,), None))
+        else:
+            compacted = compact_array(value)
+            if compacted is not value:
+                updates.append((path + (key,), compacted))
+    return updates
+
+
+def compact_figure(fig):
+    # Shrink the JSON payload st.plotly_chart ships to the browser without
+    # changing what is drawn: numeric data goes out as base64 typed arrays,
+    # whole numbers as narrow ints, and default-valued styling is dropped
+    for trace in fig.data:
+        props = trace.to_plotly_json()
+        defaults = dict(REDUNDANT_DEFAULTS)
+        # Bars and scatters only default to vertical when both axes are given
+        if not ('x' in props and 'y' in props):
+            defaults.pop('orientation', None)
+        else:
+            defaults['orientation'] = 'v'
+        for path, value in _compact_props(props, defaults):
+            # Plotly skips assigning an array equal to the current one, which
+            # a narrowed copy always is, so clear the property first
+            trace[path] = None
+            if value is not None:
+                trace[path] = value
+    return fig
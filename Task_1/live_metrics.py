@@ -0,0 +1,138 @@
+# --- Live Metrics ---
+import csv
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from time_series import SUM_COLUMNS, add_kpis
+
+# Local event log the live mode tails. Producers append one CSV line per event:
+#   campaign ID,event,cost
+# where event is one of EVENT_TYPES and cost is the spend attached to it
+LIVE_EVENTS_PATH = os.path.join(os.path.dirname(__file__), "events.csv")
+LIVE_REFRESH_SECONDS = 2
+
+EVENT_COLUMNS = ['campaign ID', 'event', 'cost']
+
+# Event type -> the aggregate column it counts towards
+EVENT_TYPES = {
+    'impression': 'Impressions',
+    'click': 'Clicks',
+    'result': 'Unique Link Clicks (ULC)',
+}
+
+
+class EventFileTail:
+    # Follows an append-only event file from a byte offset, so each poll only
+    # reads what was written since the last one. A trailing partial line is
+    # left for the next poll.
+
+    def __init__(self, path=LIVE_EVENTS_PATH):
+        self.path = path
+        self.offset = 0
+
+    def read_batch(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.offset:
+                # File was truncated or rotated: start over
+                self.offset = 0
+            f.seek(self.offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+
+        # One vectorized parse per micro-batch instead of one per event. Lines
+        # with extra fields are skipped, an unparseable cost counts as no spend
+        # and quotes are plain characters (events never quote a field), so one
+        # bad line cannot sink the rest of the batch.
+        batch = pd.read_csv(io.BytesIO(chunk[:end]), names=EVENT_COLUMNS, header=None,
+                            dtype=str, on_bad_lines='skip', quoting=csv.QUOTE_NONE,
+                            encoding_errors='replace')
+        batch['cost'] = pd.to_numeric(batch['cost'], errors='coerce')
+        # Only move past the bytes once they have been parsed
+        self.offset += end
+        return batch
+
+
+class LiveAggregator:
+    # Running per-campaign totals behind the KPI cards, updated one micro-batch
+    # at a time
+
+    def __init__(self):
+        self.totals = pd.DataFrame(columns=SUM_COLUMNS, dtype=float)
+        self.totals.index.name = 'campaign ID'
+        self.events = 0
+
+    def ingest(self, batch: pd.DataFrame):
+        if batch.empty:
+            return
+        batch = batch[batch['event'].isin(EVENT_TYPES)]
+
+        counts = (
+            batch.groupby(['campaign ID', 'event']).size()
+            .unstack(fill_value=0)
+            .rename(columns=EVENT_TYPES)
+        )
+        update = counts.reindex(columns=SUM_COLUMNS, fill_value=0).astype(float)
+        update['Amount Spent'] = batch.groupby('campaign ID')['cost'].sum()
+
+        self.totals = self.totals.add(update, fill_value=0)
+        self.events += len(batch)
+
+    def kpis(self):
+        return add_kpis(self.totals.reset_index())
+
+
+class LiveMetrics:
+    # Tail + aggregator pair shared by every session; the lock keeps two
+    # sessions refreshing at once from reading the same bytes twice
+
+    def __init__(self, path=LIVE_EVENTS_PATH):
+        self.tail = EventFileTail(path)
+        self.aggregator = LiveAggregator()
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            self.aggregator.ingest(self.tail.read_batch())
+            return self.aggregator.kpis(), self.aggregator.events
+
+
+@st.cache_resource
+def get_live_metrics(path=LIVE_EVENTS_PATH):
+    return LiveMetrics(path)
+
+
+def write_sample_events(campaign_ids, path=LIVE_EVENTS_PATH, rate=20000, seconds=60, seed=0):
+    # Local stand-in for the ad platform's stream: appends `rate` synthetic
+    # events per second for `seconds` seconds
+    rng = np.random.default_rng(seed)
+    campaign_ids = np.asarray(campaign_ids)
+    kinds = np.array(list(EVENT_TYPES))
+    for _ in range(seconds):
+        started = time.monotonic()
+        kind = rng.choice(kinds, size=rate, p=[0.95, 0.04, 0.01])
+        cost = np.where(kind == 'impression', rng.gamma(2.0, 0.02, size=rate), 0.0).round(4)
+        events = pd.DataFrame({
+            'campaign ID': rng.choice(campaign_ids, size=rate),
+            'event': kind,
+            'cost': cost,
+        })
+        events.to_csv(path, mode='a', header=False, index=False)
+        time.sleep(max(0.0, 1 - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    from load_data import load_data
+
+    write_sample_events(sorted(load_data()['campaign ID'].unique()))
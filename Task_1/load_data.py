@@ -1,11 +1,30 @@
 # --- Load Data ---
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
+import pickle
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv(os.path.join(os.path.dirname(__file__), "data.csv"))
+from data_quality import assess_data_quality, score_anomalies
+from scoring import bootstrap_scores
+
+# Optional per-row date; data.csv has none, so every date feature is skipped
+# unless an export with this column is dropped in its place
+DATE_COLUMN = "Date"
+
+# CAMPAIGN_DATA_PATH points the dashboard at another file with the same
+# schema, e.g. the synthetic data the scale tests run it on
+DATA_PATH = os.environ.get("CAMPAIGN_DATA_PATH", os.path.join(os.path.dirname(__file__), "data.csv"))
+
+# Bump when the cleaning below changes, so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+def read_campaign_data(path=DATA_PATH, date_column=DATE_COLUMN):
+    # Uncached loader, shared by the dashboard and the headless scale tests
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
     
     # Change "Amount Spent in INR" to "Amount Spent" since we're displaying it as a generic currency
     df = df.rename(columns={"Amount Spent in INR": "Amount Spent"})
@@ -14,11 +33,127 @@ def load_data():
     df['Amount Spent'] = df['Amount Spent'].str.replace('$', '').str.replace(',', '').astype(float)
     df['Cost Per Click (CPC)'] = df['Cost Per Click (CPC)'].str.replace('$', '').str.replace(',', '').astype(float)
     df['Cost per Result (CPR)'] = df['Cost per Result (CPR)'].str.replace('$', '').str.replace(',', '').astype(float)
+
+    # Parse the date dimension (day granularity) when the export has one
+    if date_column and date_column in df.columns:
+        df[date_column] = pd.to_datetime(df[date_column]).dt.normalize()
     
-    # Calculate additional metrics
-    df['Conversion Rate'] = df['Unique Link Clicks (ULC)'] / df['Impressions'] * 100
-    df['ROI Score'] = df['Unique Link Clicks (ULC)'] / df['Amount Spent']
-    df['Efficiency Score'] = df['Click-Through Rate (CTR in %)'] / df['Cost per Result (CPR)']
-    df['CPM'] = df['Amount Spent'] / df['Impressions'] * 1000  # Renamed to simpler CPM
+    # Calculate additional metrics; zero denominators give NaN rather than inf,
+    # which pandas' mean() skips but which would swamp every max() normalization
+    df['Conversion Rate'] = df['Unique Link Clicks (ULC)'] / df['Impressions'].replace(0, np.nan) * 100
+    df['ROI Score'] = df['Unique Link Clicks (ULC)'] / df['Amount Spent'].replace(0, np.nan)
+    df['Efficiency Score'] = df['Click-Through Rate (CTR in %)'] / df['Cost per Result (CPR)'].replace(0, np.nan)
+    df['CPM'] = df['Amount Spent'] / df['Impressions'].replace(0, np.nan) * 1000  # Renamed to simpler CPM
     
-    return df
\ No newline at end of file
+    return df
+
+
+def headline_metrics(df):
+    # The four KPI cards, for the full data or any filtered slice of it
+    return {
+        'Total Spend': df['Amount Spent'].sum(),
+        'Average CTR': df['Click-Through Rate (CTR in %)'].mean(),
+        'Average CPC': df['Cost Per Click (CPC)'].mean(),
+        'Average CPR': df['Cost per Result (CPR)'].mean(),
+    }
+
+
+# --- Snapshot ---
+# The cleaned frame and headline aggregates are pickled next to the source, so
+# a fresh process unpickles them instead of re-parsing and re-cleaning the CSV.
+# The file holds three pickles: a small header (source key + headline
+# metrics), the data-quality report, then the frame, so the KPI cards and the
+# quality report can each be read without unpickling the frame. The frame has
+# already been through the quality stage: quarantined rows are in the report.
+
+def snapshot_path(path=DATA_PATH):
+    return path + ".snapshot.pkl"
+
+
+def _source_key(path, date_column):
+    stat = os.stat(path)
+    return (SNAPSHOT_VERSION, stat.st_mtime_ns, stat.st_size, date_column)
+
+
+def build_snapshot(path=DATA_PATH, date_column=DATE_COLUMN):
+    df, quality = assess_data_quality(read_campaign_data(path, date_column))
+    header = {'key': _source_key(path, date_column), 'headline': headline_metrics(df)}
+    try:
+        with open(snapshot_path(path) + ".tmp", 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(quality, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(snapshot_path(path) + ".tmp", snapshot_path(path))
+    except OSError:
+        # Read-only filesystem: carry on without a snapshot
+        pass
+    return {**header, 'frame': df, 'quality': quality}
+
+
+def load_snapshot(path=DATA_PATH, date_column=DATE_COLUMN, frame=True, quality=True):
+    # The snapshot if it was built from the current source file, else None.
+    # Reading stops after the header or the quality report when the parts
+    # after them are not wanted.
+    try:
+        with open(snapshot_path(path), 'rb') as f:
+            state = pickle.load(f)
+            if state.get('key') != _source_key(path, date_column):
+                return None
+            if quality or frame:
+                state['quality'] = pickle.load(f)
+            if frame:
+                state['frame'] = pickle.load(f)
+    except Exception:
+        # Unpickling a stale or corrupt file can raise almost anything
+        # (ImportError, ValueError, TypeError, ...); any failure just means
+        # the snapshot is rebuilt from the source
+        return None
+    return state
+
+
+@st.cache_data
+def load_data(date_column=DATE_COLUMN, path=DATA_PATH):
+    state = load_snapshot(path, date_column) or build_snapshot(path, date_column)
+    return state['frame']
+
+
+@st.cache_data
+def load_headline(date_column=DATE_COLUMN, path=DATA_PATH):
+    state = load_snapshot(path, date_column, frame=False, quality=False) or build_snapshot(path, date_column)
+    return state['headline']
+
+
+@st.cache_data
+def load_quality_report(date_column=DATE_COLUMN, path=DATA_PATH):
+    # Rows quarantined at load time and the anomalous campaign x age x
+    # geography cells, as built alongside the frame load_data() returns
+    state = load_snapshot(path, date_column, frame=False) or build_snapshot(path, date_column)
+    return state['quality']
+
+
+def filter_rows(df, campaigns, audiences, ages, geos, date_range=None, date_column=DATE_COLUMN):
+    # The sidebar's filters, for the loaders cached per filter selection
+    filtered = df[(df['campaign ID'].isin(campaigns)) &
+                  (df['Audience'].isin(audiences)) &
+                  (df['Age'].isin(ages)) &
+                  (df['Geography'].isin(geos))]
+    if date_range is not None:
+        filtered = filtered[filtered[date_column].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))]
+    return filtered
+
+
+@st.cache_data
+def load_bootstrap_scores(campaigns, audiences, ages, geos, date_range=None, date_column=DATE_COLUMN):
+    # Resampled once per combination of the sidebar filters, so reruns from
+    # widgets further down the page (sliders, selectboxes) reuse the result
+    df = load_data(date_column)
+    return bootstrap_scores(filter_rows(df, campaigns, audiences, ages, geos, date_range, date_column))
+
+
+@st.cache_data
+def load_anomalies(campaigns, audiences, ages, geos, date_range=None, date_column=DATE_COLUMN):
+    # Anomalous cells among the filtered rows. The load-time report sums each
+    # cell over every audience and date, so it cannot be narrowed to those
+    # filters afterwards; the cells are rescored over the selection instead.
+    df = load_data(date_column)
+    return score_anomalies(filter_rows(df, campaigns, audiences, ages, geos, date_range, date_column))
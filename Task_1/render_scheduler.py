@@ -0,0 +1,26 @@
+# --- Render Scheduler ---
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from figure_encoding import compact_figure
+
+
+def _build_compact(builder):
+    return compact_figure(builder())
+
+
+def build_figures(builders, max_workers=None):
+    # Build independent Plotly figures concurrently. Builders must not call
+    # Streamlit themselves: only the script thread may write to the page, so
+    # the caller emits the returned figures afterwards, in page order.
+    # Each figure is compacted in its worker, but st.plotly_chart still
+    # validates and serializes it to JSON on the script thread, and the
+    # builders are mostly GIL-bound Python: this buys overlap only where
+    # pandas releases the GIL, not a multi-core speedup.
+    if max_workers is None:
+        max_workers = min(len(builders), os.cpu_count() or 1) or 1
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(_build_compact, builder) for name, builder in builders.items()}
+        # dicts keep insertion order, so results come back in the order submitted
+        return {name: future.result() for name, future in futures.items()}
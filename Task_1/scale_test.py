@@ -0,0 +1,162 @@
+# --- Scale Test Harness ---
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from synthetic_data import generate_dataset
+
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+DEFAULT_TIMEOUT_SECONDS = 30 * 60
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux (bytes on macOS); it only ever grows, so
+    # each stage records the peak reached so far
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_pipeline(path, timeout=DEFAULT_TIMEOUT_SECONDS):
+    # The dashboard's data path without a browser, one timed stage per piece:
+    # load, the quality stage, the sidebar's default (select-all) filters,
+    # the campaign aggregates and composite score, the bootstrap behind the
+    # recommendation's confidence, the budget optimizer, the default
+    # Audience x Age segment matrix, and the additional charts built and
+    # serialized the way st.plotly_chart would. Last, the real script runs
+    # end to end under AppTest on the same file, which also covers the
+    # main-page charts and every Streamlit call.
+    os.environ["CAMPAIGN_DATA_PATH"] = path
+
+    import plotly.io as pio
+    from streamlit.testing.v1 import AppTest
+
+    from analysis_context import AnalysisContext
+    from budget_optimizer import fit_response_curves, optimize_allocation, summarize_allocation
+    from data_quality import assess_data_quality
+    from load_data import read_campaign_data
+    from render_scheduler import build_figures
+    from scoring import bootstrap_scores, composite_score
+    from segments import cross_segments, evaluate_segments
+    from visualizations_additional import additional_figure_builders
+
+    stages = []
+
+    def stage(name, started):
+        stages.append({'stage': name, 'seconds': time.perf_counter() - started, 'peak_rss_mb': _peak_rss_mb()})
+
+    started = time.perf_counter()
+    df = read_campaign_data(path)
+    stage('load', started)
+
+    started = time.perf_counter()
+    df, quality = assess_data_quality(df)
+    stage('quality', started)
+
+    started = time.perf_counter()
+    filtered_df = df[(df['campaign ID'].isin(df['campaign ID'].unique())) &
+                     (df['Audience'].isin(df['Audience'].unique())) &
+                     (df['Age'].isin(df['Age'].unique())) &
+                     (df['Geography'].isin(df['Geography'].unique()))]
+    stage('filter', started)
+
+    started = time.perf_counter()
+    context = AnalysisContext(filtered_df)
+    campaign_efficiency = context['by_campaign'].copy()
+    campaign_efficiency['Composite Score'] = composite_score(
+        campaign_efficiency['Efficiency Score'],
+        campaign_efficiency['ROI Score'],
+        campaign_efficiency['Cost per Result (CPR)']
+    )
+    stage('aggregate', started)
+
+    started = time.perf_counter()
+    bootstrap_scores(filtered_df)
+    stage('bootstrap', started)
+
+    started = time.perf_counter()
+    allocation = optimize_allocation(fit_response_curves(filtered_df), float(filtered_df['Amount Spent'].sum()))
+    summarize_allocation(allocation)
+    stage('budget', started)
+
+    started = time.perf_counter()
+    evaluate_segments(filtered_df, cross_segments(filtered_df, ['Audience', 'Age']))
+    stage('segments', started)
+
+    started = time.perf_counter()
+    figures = build_figures(additional_figure_builders(context))
+    stage('figures', started)
+
+    started = time.perf_counter()
+    payload = sum(len(pio.to_json(fig, validate=False)) for fig in figures.values())
+    stage('serialize', started)
+
+    started = time.perf_counter()
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "campaign_dashboard.py"),
+                            default_timeout=timeout).run()
+    # The script catches its own failures and reports them through st.error
+    failures = [e.value for e in app.exception]
+    failures += [e.value for e in app.error if e.value.startswith("An error occurred")]
+    if failures:
+        raise RuntimeError(f"Dashboard failed: {failures[0]}")
+    app_payload = sum(len(chart.proto.spec) for chart in app.get("plotly_chart"))
+    stage('app', started)
+
+    return {'rows': len(df), 'campaigns': len(campaign_efficiency), 'payload_mb': payload / 1e6,
+            'app_payload_mb': app_payload / 1e6, 'stages': stages}
+
+
+def run_scale(rows, seed=0, fmt='csv', timeout=DEFAULT_TIMEOUT_SECONDS):
+    # Generate (or reuse) the dataset, then run the pipeline in a fresh
+    # interpreter so every scale starts from a clean peak RSS
+    started = time.perf_counter()
+    path = generate_dataset(rows, seed, fmt)
+    generate_seconds = time.perf_counter() - started
+
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--pipeline", path, "--timeout", str(timeout)],
+            capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return [{'scale': rows, 'stage': 'timeout', 'seconds': timeout, 'peak_rss_mb': None}]
+    if completed.returncode != 0:
+        # Typically an out-of-memory kill at the largest scales
+        error = completed.stderr.strip().splitlines()
+        return [{'scale': rows, 'stage': 'failed', 'seconds': None, 'peak_rss_mb': None,
+                 'error': error[-1] if error else f"exit {completed.returncode}"}]
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    records = [{'scale': rows, 'stage': 'generate', 'seconds': generate_seconds, 'peak_rss_mb': None}]
+    for record in result['stages']:
+        records.append({'scale': rows, **record})
+    records.append({'scale': rows, 'stage': 'total', 'seconds': sum(r['seconds'] for r in result['stages']),
+                    'peak_rss_mb': result['stages'][-1]['peak_rss_mb'], 'payload_mb': result['payload_mb'],
+                    'app_payload_mb': result['app_payload_mb']})
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the dashboard pipeline on synthetic data at increasing scales")
+    parser.add_argument("scales", type=int, nargs="*", default=DEFAULT_SCALES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help="Seconds allowed per scale before it is recorded as a timeout")
+    parser.add_argument("--output", help="Write the results to this CSV file")
+    parser.add_argument("--pipeline", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pipeline:
+        print(json.dumps(run_pipeline(args.pipeline, args.timeout)))
+        sys.exit(0)
+
+    results = pd.DataFrame([record for rows in args.scales for record in run_scale(rows, args.seed, args.format, args.timeout)])
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
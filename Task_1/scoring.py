@@ -0,0 +1,152 @@
+# --- Composite Score & Uncertainty ---
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Beta draws switch to a matched normal once both shape parameters reach this
+NORMAL_APPROX_MIN_COUNT = 30
+
+# Resamples are cut back so resamples x rows stays within this many draws,
+# but never below the minimum, keeping large filtered selections bounded
+MAX_TOTAL_DRAWS = 5_000_000
+MIN_RESAMPLES = 100
+
+# Lower composite scores are worse performing campaigns
+COMPOSITE_WEIGHTS = {
+    'Efficiency Score': 0.4,
+    'ROI Score': 0.4,
+    'Cost per Result (CPR)': 0.2,
+}
+
+
+def composite_score(efficiency, roi, cpr):
+    # Each metric is normalised by its maximum across campaigns (the last axis),
+    # so the same formula scores one set of campaigns or a batch of resamples
+    efficiency, roi, cpr = np.asarray(efficiency), np.asarray(roi), np.asarray(cpr)
+    return (
+        (efficiency / np.nanmax(efficiency, axis=-1, keepdims=True)) * COMPOSITE_WEIGHTS['Efficiency Score'] +
+        (roi / np.nanmax(roi, axis=-1, keepdims=True)) * COMPOSITE_WEIGHTS['ROI Score'] +
+        (1 - (cpr / np.nanmax(cpr, axis=-1, keepdims=True))) * COMPOSITE_WEIGHTS['Cost per Result (CPR)']
+    )
+
+
+def _rate_draws(rng, successes, trials, size):
+    # Posterior draws of a per-row rate under a uniform prior, Beta(k + 1, n - k + 1).
+    # Beta sampling is slow, so rows whose shape parameters are both large
+    # enough for the Beta to be effectively Gaussian use a normal draw with
+    # the same mean and variance instead.
+    a = successes + 1
+    b = np.maximum(trials - successes, 0) + 1
+    mean = a / (a + b)
+    sd = np.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+    draws = mean + sd * rng.standard_normal(size)
+
+    small = np.minimum(a, b) < NORMAL_APPROX_MIN_COUNT
+    if small.any():
+        draws[:, small] = rng.beta(a[small], b[small], size=(size[0], small.sum()))
+    return np.clip(draws, np.finfo(float).tiny, 1)
+
+
+def _campaign_means(values, starts):
+    # Mean over each campaign's rows for every resample at once: rows are
+    # pre-sorted by campaign, so one reduceat sums every segment. Non-finite
+    # values (a zero spend leaves ROI and CPR undefined) are left out of both
+    # the sum and the count, like pandas' NaN-skipping mean().
+    finite = np.isfinite(values)
+    sums = np.add.reduceat(np.where(finite, values, 0.0), starts, axis=1)
+    counts = np.add.reduceat(finite, starts, axis=1)
+    return np.where(counts > 0, sums / counts, np.nan)
+
+
+def bootstrap_scores(df: pd.DataFrame, n_resamples=2000, interval=0.95, seed=0, max_draws=5_000_000):
+    # Beta-binomial resampling of every row's click and result rates: a cell
+    # with k clicks out of n impressions draws its CTR from Beta(k + 1, n - k + 1),
+    # so small cells spread wide and large ones barely move. Each resample
+    # re-derives the dashboard's per-campaign means and composite score, all
+    # campaigns in one batched NumPy pass, processed in blocks of at most
+    # `max_draws` row draws to bound memory on large frames. Large frames also
+    # get fewer resamples (see MAX_TOTAL_DRAWS) to bound the time.
+    campaigns, codes = np.unique(df['campaign ID'].to_numpy(), return_inverse=True)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes, minlength=len(campaigns))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    impressions = df['Impressions'].to_numpy(dtype=float)[order]
+    clicks = df['Clicks'].to_numpy(dtype=float)[order]
+    results = df['Unique Link Clicks (ULC)'].to_numpy(dtype=float)[order]
+    spend = df['Amount Spent'].to_numpy(dtype=float)[order]
+    # Zero spend gives NaN rather than inf, as in load_data
+    spend = np.where(spend > 0, spend, np.nan)
+
+    n_resamples = min(n_resamples, max(MIN_RESAMPLES, MAX_TOTAL_DRAWS // max(len(df), 1)))
+    rng = np.random.default_rng(seed)
+    block = max(1, min(n_resamples, max_draws // max(len(df), 1)))
+    ctr_draws, roi_draws, composite_draws = [], [], []
+
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # A resample in which no campaign has spend is all-NaN; it is left out
+        # of P(Worst) below
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for done in range(0, n_resamples, block):
+            size = (min(block, n_resamples - done), len(df))
+            ctr = _rate_draws(rng, clicks, impressions, size) * 100
+            ulc = _rate_draws(rng, results, impressions, size) * impressions
+            cpr = spend / ulc
+
+            mean_ctr = _campaign_means(ctr, starts)
+            mean_cpr = _campaign_means(cpr, starts)
+            mean_efficiency = _campaign_means(ctr / cpr, starts)
+            mean_roi = _campaign_means(ulc / spend, starts)
+
+            ctr_draws.append(mean_ctr)
+            roi_draws.append(mean_roi)
+            composite_draws.append(composite_score(mean_efficiency, mean_roi, mean_cpr))
+
+    ctr_draws = np.concatenate(ctr_draws)
+    roi_draws = np.concatenate(roi_draws)
+    composite_draws = np.concatenate(composite_draws)
+
+    tails = [(1 - interval) / 2, 1 - (1 - interval) / 2]
+    ctr_low, ctr_high = np.quantile(ctr_draws, tails, axis=0)
+    roi_low, roi_high = np.quantile(roi_draws, tails, axis=0)
+    composite_low, composite_high = np.quantile(composite_draws, tails, axis=0)
+
+    # Share of resamples in which each campaign has the lowest composite score,
+    # among the resamples where any campaign has one. With no spend or results
+    # anywhere in the selection no campaign does, and P(Worst) is NaN.
+    scored = ~np.isnan(composite_draws).all(axis=1)
+    if scored.any():
+        worst = np.bincount(np.nanargmin(composite_draws[scored], axis=1), minlength=len(campaigns)) / scored.sum()
+    else:
+        worst = np.full(len(campaigns), np.nan)
+
+    return pd.DataFrame({
+        'campaign ID': campaigns,
+        'CTR Low': ctr_low,
+        'CTR High': ctr_high,
+        'ROI Low': roi_low,
+        'ROI High': roi_high,
+        'Composite Low': composite_low,
+        'Composite High': composite_high,
+        'P(Worst)': worst,
+    })
+
+
+if __name__ == "__main__":
+    # Sanity check: a zero-spend row must not turn its campaign's ROI into inf
+    # and collapse every other campaign's score through the max() normalization
+    from load_data import read_campaign_data
+
+    df = read_campaign_data()
+    df.loc[df.index[0], 'Amount Spent'] = 0
+    scores = bootstrap_scores(df, n_resamples=500)
+    interval_columns = ['CTR Low', 'CTR High', 'ROI Low', 'ROI High', 'Composite Low', 'Composite High']
+    assert np.isfinite(scores[interval_columns].to_numpy()).all(), scores
+    assert (scores['Composite High'] > 0).all(), scores
+    assert np.isclose(scores['P(Worst)'].sum(), 1), scores
+    print(scores.to_string(index=False))
+
+    # A selection with no spend at all (a paused campaign) has nothing to rank
+    paused = df[df['campaign ID'] == df['campaign ID'].iloc[0]].assign(**{'Amount Spent': 0.0})
+    assert bootstrap_scores(paused, n_resamples=100)['P(Worst)'].isna().all()
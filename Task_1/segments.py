@@ -0,0 +1,116 @@
+# --- Segment Drill-Down ---
+import numpy as np
+import pandas as pd
+
+from columns import SEGMENT_COLUMNS
+from scoring import composite_score
+
+# Totals over a segment's rows
+SEGMENT_SUM_COLUMNS = ['Amount Spent', 'Impressions', 'Clicks', 'Unique Link Clicks (ULC)']
+
+# Means over a segment's rows, the same per-row averages the campaign table uses
+SEGMENT_MEAN_COLUMNS = [
+    'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)',
+    'Efficiency Score', 'ROI Score',
+]
+
+# Upper bound on segments x cells in one membership block
+MAX_MEMBERSHIP_CELLS = 20_000_000
+
+
+def cross_segments(df: pd.DataFrame, columns):
+    # One segment per combination of `columns` present in the data, e.g. every
+    # Audience x Age pair, named like "Students / 18-24"
+    combos = df[list(columns)].drop_duplicates().sort_values(list(columns))
+    return {
+        ' / '.join(map(str, values)): {column: [value] for column, value in zip(columns, values)}
+        for values in combos.itertuples(index=False, name=None)
+    }
+
+
+class SegmentEngine:
+    # Evaluates many segment predicates over the same rows in one pass. A
+    # predicate maps some of SEGMENT_COLUMNS to the values it keeps, e.g.
+    # {'Audience': ['Students'], 'Age': ['18-24', '25-34']}.
+    #
+    # The rows are collapsed once into cells, one per distinct combination of
+    # SEGMENT_COLUMNS, holding the sums every KPI is derived from. Predicates
+    # are masks over cells rather than rows: each (column, values) mask is
+    # built once and shared by every segment that uses it, and all segments are
+    # aggregated together as one segments x cells membership matrix product.
+
+    def __init__(self, df: pd.DataFrame):
+        self.levels = {}
+        codes = []
+        for column in SEGMENT_COLUMNS:
+            column_codes, self.levels[column] = pd.factorize(df[column], sort=True)
+            codes.append(column_codes)
+        shape = tuple(max(len(levels), 1) for levels in self.levels.values())
+
+        cell_keys, cell_of_row = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        self.cell_codes = dict(zip(SEGMENT_COLUMNS, np.unravel_index(cell_keys, shape)))
+        self.n_cells = len(cell_keys)
+
+        # Per cell: row count, the summed columns, then for each mean column the
+        # sum and count of its finite values (load_data turns zero
+        # denominators into NaN, which is left out of the mean)
+        columns = [np.ones(len(df))]
+        columns += [df[column].to_numpy(dtype=float) for column in SEGMENT_SUM_COLUMNS]
+        for column in SEGMENT_MEAN_COLUMNS:
+            values = df[column].to_numpy(dtype=float)
+            finite = np.isfinite(values)
+            columns += [np.where(finite, values, 0.0), finite.astype(float)]
+        self.cell_values = np.column_stack([
+            np.bincount(cell_of_row, weights=values, minlength=self.n_cells) for values in columns
+        ])
+
+        self._masks = {}
+
+    def _column_mask(self, column, values):
+        key = (column, frozenset(values))
+        if key not in self._masks:
+            keep = self.levels[column].isin(list(values))
+            self._masks[key] = keep[self.cell_codes[column]]
+        return self._masks[key]
+
+    def segment_mask(self, predicate):
+        mask = np.ones(self.n_cells, dtype=bool)
+        for column, values in predicate.items():
+            if column not in self.levels:
+                raise ValueError(f"Segments can only filter on {SEGMENT_COLUMNS}, not {column!r}")
+            if isinstance(values, str) or np.ndim(values) == 0:
+                values = [values]
+            mask &= self._column_mask(column, values)
+        return mask
+
+    def evaluate(self, segments, max_cells=MAX_MEMBERSHIP_CELLS):
+        # Comparison matrix, one row per segment: row count, totals, means and a
+        # composite score normalised across the segments. `segments` maps a
+        # name to its predicate.
+        names = list(segments)
+        block = max(1, max_cells // max(self.n_cells, 1))
+        totals = [np.zeros((0, self.cell_values.shape[1]))]
+        for start in range(0, len(names), block):
+            membership = np.stack([self.segment_mask(segments[name]) for name in names[start:start + block]])
+            totals.append(membership.astype(float) @ self.cell_values)
+        totals = np.vstack(totals)
+
+        matrix = pd.DataFrame({'Segment': names, 'Rows': totals[:, 0].astype(np.int64)})
+        for i, column in enumerate(SEGMENT_SUM_COLUMNS, start=1):
+            matrix[column] = totals[:, i]
+        offset = 1 + len(SEGMENT_SUM_COLUMNS)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, column in enumerate(SEGMENT_MEAN_COLUMNS):
+                value_sum, count = totals[:, offset + 2 * i], totals[:, offset + 2 * i + 1]
+                matrix[column] = np.where(count > 0, value_sum / count, np.nan)
+
+        if len(matrix):
+            matrix['Composite Score'] = composite_score(
+                matrix['Efficiency Score'], matrix['ROI Score'], matrix['Cost per Result (CPR)'])
+        else:
+            matrix['Composite Score'] = pd.Series(dtype=float)
+        return matrix
+
+
+def evaluate_segments(df: pd.DataFrame, segments):
+    return SegmentEngine(df).evaluate(segments)
@@ -0,0 +1,163 @@
+# --- Synthetic Data Generator ---
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SYNTHETIC_DIR = os.path.join(os.path.dirname(__file__), "scale_data")
+
+# Same columns, in the same order, as data.csv (including the two empty
+# '@dropdown' columns the export carries)
+CSV_COLUMNS = [
+    'campaign ID', 'Campaign Name', 'Audience', 'Age', 'Geography', 'Reach', 'Impressions', 'Frequency',
+    'Clicks', 'Unique Clicks', 'Unique Link Clicks (ULC)', 'Click-Through Rate (CTR in %)',
+    'Unique Click-Through Rate (Unique CTR in %)', 'Amount Spent in INR', 'Cost Per Click (CPC)',
+    'Cost per Result (CPR)', '@dropdown', '@dropdown',
+]
+# Parquet needs unique names; this matches what read_csv calls the duplicate
+PARQUET_COLUMNS = CSV_COLUMNS[:-1] + ['@dropdown.1']
+
+AUDIENCES = ['Educators and Principals', 'Students']
+AGES = ['13-17', '18-24', '25-34', '35-44', '45-54', '55-64']
+GEOGRAPHIES = [
+    'Group 1 (Australia, Canada, United Kingdom, Ghana, Nigeria, Pakistan, United States)',
+    'Group 2 (Australia, Canada, United Kingdom, Ghana, Niger, Nigeria, Nepal, Pakistan, Thailand, Taiwan)',
+    'Australia', 'Canada', 'Ghana', 'India', 'Nepal', 'Nigeria', 'UAE', 'UK', 'USA',
+]
+
+CHUNK_ROWS = 1_000_000
+
+
+def _currency(values):
+    # "$1,092.24", as in the export
+    return pd.Series(values).map('${:,.2f}'.format).to_numpy()
+
+
+def generate_chunk(first_campaign, n_campaigns, rows_per_campaign, seed):
+    # Rows for campaigns [first_campaign, first_campaign + n_campaigns). Each
+    # campaign has one audience and geography and `rows_per_campaign` distinct
+    # age groups, like data.csv. `seed` is a SeedSequence, so every chunk is
+    # reproducible on its own whichever worker builds it.
+    rng = np.random.default_rng(seed)
+    n = n_campaigns * rows_per_campaign
+
+    campaign = np.repeat(np.arange(first_campaign, first_campaign + n_campaigns), rows_per_campaign)
+    audience = np.repeat(rng.integers(0, len(AUDIENCES), n_campaigns), rows_per_campaign)
+    geography = np.repeat(rng.integers(0, len(GEOGRAPHIES), n_campaigns), rows_per_campaign)
+    # Distinct ages per campaign: the first columns of a random permutation
+    age = np.argsort(rng.random((n_campaigns, len(AGES))), axis=1)[:, :rows_per_campaign].ravel()
+
+    reach = np.maximum(rng.lognormal(8.0, 1.2, n).astype(np.int64), 50)
+    frequency = rng.uniform(1.0, 2.5, n)
+    impressions = np.round(reach * frequency).astype(np.int64)
+    frequency = impressions / reach
+    clicks = np.maximum(rng.binomial(impressions, rng.beta(2.0, 40.0, n)), 1)
+    unique_clicks = np.maximum(rng.binomial(clicks, 0.8), 1)
+    results = np.maximum(rng.binomial(unique_clicks, 0.5), 1)
+    spend = np.round(impressions * rng.lognormal(3.5, 0.6, n) / 1000, 2)
+
+    audience_names = np.array(AUDIENCES, dtype=object)[audience]
+    campaign_ids = np.char.add('Campaign ', (campaign + 1).astype(str)).astype(object)
+    campaign_names = ('SHU_' + (campaign + 1).astype(str).astype(object)) + ' (' + audience_names + ')'
+
+    chunk = pd.DataFrame({
+        'campaign ID': campaign_ids,
+        'Campaign Name': campaign_names,
+        'Audience': audience_names,
+        'Age': np.array(AGES, dtype=object)[age],
+        'Geography': np.array(GEOGRAPHIES, dtype=object)[geography],
+        'Reach': reach,
+        'Impressions': impressions,
+        'Frequency': frequency,
+        'Clicks': clicks,
+        'Unique Clicks': unique_clicks,
+        'Unique Link Clicks (ULC)': results,
+        'Click-Through Rate (CTR in %)': np.round(clicks / impressions * 100, 2),
+        'Unique Click-Through Rate (Unique CTR in %)': np.round(unique_clicks / reach * 100, 2),
+        'Amount Spent in INR': _currency(spend),
+        'Cost Per Click (CPC)': _currency(spend / clicks),
+        'Cost per Result (CPR)': _currency(spend / results),
+        '@dropdown': None,
+        '@dropdown.1': None,
+    })
+    return chunk
+
+
+def _write_chunk(path, fmt, header, *chunk_args):
+    chunk = generate_chunk(*chunk_args)
+    if fmt == 'parquet':
+        chunk.columns = PARQUET_COLUMNS
+        chunk.to_parquet(path, index=False)
+    else:
+        chunk.columns = CSV_COLUMNS
+        chunk.to_csv(path, index=False, header=header)
+    return path
+
+
+def synthetic_path(rows, seed=0, fmt='csv', directory=SYNTHETIC_DIR):
+    return os.path.join(directory, f"synthetic_{rows}_{seed}.{fmt}")
+
+
+def generate_dataset(rows, seed=0, fmt='csv', directory=SYNTHETIC_DIR, rows_per_campaign=3,
+                     chunk_rows=CHUNK_ROWS, max_workers=None, overwrite=False):
+    # Write `rows` rows (rounded up to whole campaigns) as one CSV file, or as
+    # a directory of Parquet part files, building chunks in parallel worker
+    # processes. Datasets are cached on disk by (rows, seed, format): an
+    # existing output is reused unless `overwrite` is set.
+    if fmt not in ('csv', 'parquet'):
+        raise ValueError(f"Unsupported format: {fmt}")
+    rows_per_campaign = min(rows_per_campaign, len(AGES))
+
+    path = synthetic_path(rows, seed, fmt, directory)
+    if os.path.exists(path) and not overwrite:
+        return path
+
+    n_campaigns = -(-rows // rows_per_campaign)
+    campaigns_per_chunk = max(1, chunk_rows // rows_per_campaign)
+    starts = range(0, n_campaigns, campaigns_per_chunk)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    parts_dir = path + ".parts"
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(executor.map(
+            _write_chunk,
+            [os.path.join(parts_dir, f"part-{i:05d}.{fmt}") for i in range(len(starts))],
+            [fmt] * len(starts),
+            [i == 0 for i in range(len(starts))],
+            list(starts),
+            [min(campaigns_per_chunk, n_campaigns - start) for start in starts],
+            [rows_per_campaign] * len(starts),
+            seeds,
+        ))
+
+    if os.path.exists(path):
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    if fmt == 'parquet':
+        # A directory of part files reads back as one frame with pd.read_parquet
+        os.rename(parts_dir, path)
+    else:
+        # Only the first part has a header, so the parts concatenate as-is
+        with open(path + ".tmp", 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+        os.replace(path + ".tmp", path)
+        shutil.rmtree(parts_dir)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic campaign data with the data.csv schema")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    print(generate_dataset(args.rows, args.seed, args.format, max_workers=args.workers, overwrite=args.overwrite))
@@ -0,0 +1,104 @@
+# --- Time-Series KPIs ---
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from load_data import DATE_COLUMN, load_data
+
+# Additive per-row measures; every windowed KPI is derived from their sums
+SUM_COLUMNS = ['Amount Spent', 'Impressions', 'Clicks', 'Unique Link Clicks (ULC)']
+
+KPI_COLUMNS = ['Amount Spent', 'Click-Through Rate (CTR in %)', 'Cost Per Click (CPC)', 'Cost per Result (CPR)']
+
+
+def add_kpis(totals: pd.DataFrame):
+    # Ratios of sums rather than means of per-row ratios, so a window's CTR/CPC/CPR
+    # weigh each row by its volume. Zero denominators give NaN instead of inf.
+    totals['Click-Through Rate (CTR in %)'] = totals['Clicks'] / totals['Impressions'].replace(0, np.nan) * 100
+    totals['Cost Per Click (CPC)'] = totals['Amount Spent'] / totals['Clicks'].replace(0, np.nan)
+    totals['Cost per Result (CPR)'] = totals['Amount Spent'] / totals['Unique Link Clicks (ULC)'].replace(0, np.nan)
+    return totals
+
+
+def daily_totals(df: pd.DataFrame, date_column=DATE_COLUMN):
+    return df.groupby(['campaign ID', date_column])[SUM_COLUMNS].sum().reset_index()
+
+
+class WindowedKPIs:
+    # Per-campaign KPIs over arbitrary date windows. The daily totals are laid
+    # out on a dense campaign x day grid and turned into running (prefix) sums
+    # once; the sums for any window are then the difference of two prefix rows.
+    # Sliding the date range or the rolling window therefore costs
+    # O(campaigns) per window instead of a regroup of the raw rows.
+
+    def __init__(self, daily: pd.DataFrame, date_column=DATE_COLUMN):
+        self.date_column = date_column
+        self.campaigns = np.array(sorted(daily['campaign ID'].unique()))
+        if len(daily):
+            self.dates = pd.date_range(daily[date_column].min(), daily[date_column].max(), freq='D')
+        else:
+            self.dates = pd.DatetimeIndex([])
+
+        grid = np.zeros((len(self.campaigns), len(self.dates), len(SUM_COLUMNS)))
+        rows = np.searchsorted(self.campaigns, daily['campaign ID'].to_numpy())
+        cols = self.dates.get_indexer(daily[date_column])
+        np.add.at(grid, (rows, cols), daily[SUM_COLUMNS].to_numpy(dtype=float))
+
+        # prefix[:, i] holds the totals of days [0, i); the leading zero column
+        # makes every window a plain difference, including ones starting at day 0
+        self.prefix = np.zeros((len(self.campaigns), len(self.dates) + 1, len(SUM_COLUMNS)))
+        np.cumsum(grid, axis=1, out=self.prefix[:, 1:])
+
+    def _bounds(self, start, end):
+        start = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start))
+        end = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return start, end
+
+    def window(self, start=None, end=None):
+        # Totals and KPIs per campaign for the inclusive date range [start, end]
+        lo, hi = self._bounds(start, end)
+        sums = self.prefix[:, max(hi, lo)] - self.prefix[:, lo]
+        totals = pd.DataFrame(sums, columns=SUM_COLUMNS)
+        totals.insert(0, 'campaign ID', self.campaigns)
+        return add_kpis(totals)
+
+    def _frame(self, ends, sums):
+        # Long format (campaign ID, date, totals, KPIs) from per-period sums
+        totals = pd.DataFrame(sums.reshape(-1, len(SUM_COLUMNS)), columns=SUM_COLUMNS)
+        totals.insert(0, 'campaign ID', np.repeat(self.campaigns, len(ends)))
+        totals.insert(1, self.date_column, np.tile(self.dates[ends - 1], len(self.campaigns)))
+        return add_kpis(totals)
+
+    def daily(self, start=None, end=None):
+        return self.rolling(1, start, end)
+
+    def rolling(self, days, start=None, end=None):
+        # Trailing `days`-day window ending on every date in [start, end];
+        # windows near the start of the data cover only the days available
+        lo, hi = self._bounds(start, end)
+        ends = np.arange(lo + 1, hi + 1)
+        starts = np.maximum(ends - days, 0)
+        return self._frame(ends, self.prefix[:, ends] - self.prefix[:, starts])
+
+    def weekly(self, start=None, end=None):
+        # Calendar weeks (Monday to Sunday) clipped to [start, end], dated by
+        # their last day inside the range
+        lo, hi = self._bounds(start, end)
+        if hi <= lo:
+            return self._frame(np.array([], dtype=int), self.prefix[:, :0])
+        week = self.dates[lo:hi].to_period('W').asi8
+        ends = lo + np.flatnonzero(np.append(week[1:] != week[:-1], True)) + 1
+        starts = np.concatenate(([lo], ends[:-1]))
+        return self._frame(ends, self.prefix[:, ends] - self.prefix[:, starts])
+
+
+@st.cache_data
+def load_windowed_kpis(campaigns, audiences, ages, geos, date_column=DATE_COLUMN):
+    # Built once per combination of the non-date sidebar filters, so moving the
+    # date range only does prefix-sum lookups on the cached grid
+    df = load_data(date_column)
+    filtered = df[(df['campaign ID'].isin(campaigns)) &
+                  (df['Audience'].isin(audiences)) &
+                  (df['Age'].isin(ages)) &
+                  (df['Geography'].isin(geos))]
+    return WindowedKPIs(daily_totals(filtered, date_column), date_column)
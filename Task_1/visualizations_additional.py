@@ -5,90 +5,92 @@ from io import BytesIO
 import base64
 import pycountry
 
+from analysis_context import AnalysisContext
 from custom_layout import apply_custom_layout
+from render_scheduler import build_figures
 
 
-def additional_visualizations(filtered: pd.DataFrame):
-    # --- CPC by Age Group ---
-    st.subheader("CPC by Age Group")
-    ctr_data = filtered.groupby('Age')["Cost Per Click (CPC)"].mean().reset_index()
-    fig_ctr_age = px.bar(ctr_data, x='Age', y='Cost Per Click (CPC)', color='Age',
+def get_country_code(name):
+    try:
+        return pycountry.countries.lookup(name).alpha_3
+    except:
+        return None
+
+
+# --- CPC by Age Group ---
+def cpc_by_age_figure(by_age: pd.DataFrame):
+    fig_ctr_age = px.bar(by_age, x='Age', y='Cost Per Click (CPC)', color='Age',
                         title="CPC by Age Group", labels={'Cost Per Click (CPC)': 'CPC'},
                         text= "Cost Per Click (CPC)",
                         )
     apply_custom_layout(fig_ctr_age, xaxis_label="Age Group", yaxis_label="CPC")
+    return fig_ctr_age
 
-    st.plotly_chart(fig_ctr_age, use_container_width=True)
 
-    # --- CTR by Age Group ---
-    st.subheader("CTR by Age Group")
-    ctr_data = filtered.groupby('Age')["Click-Through Rate (CTR in %)"].mean().reset_index()
-    fig_ctr_age = px.bar(ctr_data, x='Age', y='Click-Through Rate (CTR in %)', color='Age',
+# --- CTR by Age Group ---
+def ctr_by_age_figure(by_age: pd.DataFrame):
+    fig_ctr_age = px.bar(by_age, x='Age', y='Click-Through Rate (CTR in %)', color='Age',
                         title="CTR by Age Group", labels={'Click-Through Rate (CTR in %)': 'CTR (%)'},
                         text = 'Click-Through Rate (CTR in %)',
                         )
     apply_custom_layout(fig_ctr_age, xaxis_label="Age Group", yaxis_label="CTR (%)")
- 
-    st.plotly_chart(fig_ctr_age, use_container_width=True)
+    return fig_ctr_age
 
-    # --- CPC vs CPR Scatter ---
-    st.subheader("CPC vs CPR")
+
+# --- CPC vs CPR Scatter ---
+def cpc_vs_cpr_figure(filtered: pd.DataFrame):
     fig_cpc_cpr = px.scatter(filtered, x="Cost Per Click (CPC)", y="Cost per Result (CPR)",
                             color="Age", hover_data=["campaign ID"], title="CPC vs CPR")
     apply_custom_layout(fig_cpc_cpr, xaxis_label="CPC ", yaxis_label="CPR", update_trace=False)
-    st.plotly_chart(fig_cpc_cpr, use_container_width=True)
+    return fig_cpc_cpr
+
 
-    # --- Spend by Geography ---
-    st.subheader("Amount Spent by Geography")
-    geo_spent = filtered.groupby("Geography")["Amount Spent"].sum().reset_index()
+# --- Spend by Geography ---
+def geo_spend_figure(geo_spent: pd.DataFrame):
     fig_geo_spend = px.bar(geo_spent, x="Geography", y="Amount Spent", title="Total Spend by Geography")
     apply_custom_layout(fig_geo_spend, xaxis_label="Geography", yaxis_label="Amount Spent", update_trace= False)
-    st.plotly_chart(fig_geo_spend, use_container_width=True)
+    return fig_geo_spend
 
-    # --- Clicks vs Impressions ---
-    st.subheader("Clicks vs Impressions")
-    clicks_imps = filtered.groupby("campaign ID")[["Clicks", "Impressions", "Unique Clicks", "Unique Link Clicks (ULC)"]].sum().reset_index()
-    fig_clicks_imps = px.line(clicks_imps, x="campaign ID", y=["Clicks", "Impressions", "Unique Clicks", "Unique Link Clicks (ULC)"],
+
+# --- Clicks vs Impressions ---
+def clicks_vs_impressions_figure(by_campaign: pd.DataFrame):
+    fig_clicks_imps = px.line(by_campaign, x="campaign ID", y=["Clicks", "Impressions", "Unique Clicks", "Unique Link Clicks (ULC)"],
                             title="Clicks and Impressions", line_shape="linear", line_dash_sequence=["solid", "dot"],)
     apply_custom_layout(fig_clicks_imps, xaxis_label="Campaign ID", yaxis_label="Count", update_trace=False)
-    st.plotly_chart(fig_clicks_imps, use_container_width=True)
+    return fig_clicks_imps
 
 
-    # --- Clicks vs Unique Clicks vs Unique Link Clicks ---
-    st.subheader("Clicks vs Unique Clicks vs Unique Link Clicks")
-    clicks_imps = filtered.groupby("campaign ID")[["Clicks", "Unique Clicks", "Unique Link Clicks (ULC)"]].sum().reset_index()
-    fig_clicks_imps = px.line(clicks_imps, x="campaign ID", y=["Clicks", "Unique Clicks", "Unique Link Clicks (ULC)"],
+# --- Clicks vs Unique Clicks vs Unique Link Clicks ---
+def clicks_vs_unique_clicks_figure(by_campaign: pd.DataFrame):
+    fig_clicks_imps = px.line(by_campaign, x="campaign ID", y=["Clicks", "Unique Clicks", "Unique Link Clicks (ULC)"],
                             title="Clicks, UC and ULC", line_shape="linear", line_dash_sequence=["solid", "dot"],)
     apply_custom_layout(fig_clicks_imps, xaxis_label="Campaign ID", yaxis_label="Count", update_trace=False)
-    st.plotly_chart(fig_clicks_imps, use_container_width=True)
-    # --- CTR vs Frequency ---
-    st.subheader("CTR vs Frequency")
+    return fig_clicks_imps
+
+
+# --- CTR vs Frequency ---
+def ctr_vs_frequency_figure(filtered: pd.DataFrame):
     fig_ctr_freq = px.scatter(filtered, x="Frequency", y="Click-Through Rate (CTR in %)",
                             color="Age", hover_data=["campaign ID"],
                             title="CTR vs Frequency")
     fig_ctr_freq.update_traces(texttemplate='%{y:.2f}%', textposition='top center')
     apply_custom_layout(fig_ctr_freq, xaxis_label="Frequency", yaxis_label="CTR (%)", update_trace= False)
-    st.plotly_chart(fig_ctr_freq, use_container_width=True)
+    return fig_ctr_freq
 
-    # --- Spend per Click by Campaign ---
-    st.subheader("Spend per Click by Campaign")
+
+# --- Spend per Click by Campaign ---
+def spend_per_click_figure(filtered: pd.DataFrame):
     spc_df = filtered.copy()
     spc_df['Spend per Click'] = spc_df['Amount Spent'] / spc_df['Clicks'].replace(0, pd.NA)
     spc_df = spc_df.dropna(subset=['Spend per Click'])
     fig_spend_click = px.bar(spc_df, x="campaign ID", y="Spend per Click",
                             color="campaign ID", title="Spend per Click by Campaign")
     apply_custom_layout(fig_spend_click, xaxis_label="Campaign ID", yaxis_label="Spend per Click", update_trace= False)
-    st.plotly_chart(fig_spend_click, use_container_width=True)
-
-    # --- Map: Spend by Geography (Choropleth) ---
-    st.subheader("🗺️ Spend by Geography Map")
+    return fig_spend_click
 
-    def get_country_code(name):
-        try:
-            return pycountry.countries.lookup(name).alpha_3
-        except:
-            return None
 
+# --- Map: Spend by Geography (Choropleth) ---
+def geo_spend_map_figure(geo_spent: pd.DataFrame):
     geo_map_df = geo_spent.copy()
     geo_map_df["iso_alpha"] = geo_map_df["Geography"].apply(get_country_code)
     geo_map_df = geo_map_df.dropna(subset=["iso_alpha"])
@@ -101,45 +103,81 @@ def additional_visualizations(filtered: pd.DataFrame):
                             title="Amount Spent by Geography (Map)")
     fig_geo_map.update_geos(projection_type="natural earth")
     # apply_custom_layout(fig_geo_map, xaxis_label="Geography", yaxis_label="Amount Spent")
-    st.plotly_chart(fig_geo_map, use_container_width=True)
+    return fig_geo_map
 
-    # --- Top 10 Campaigns by CTR ---
-    st.subheader("🏆 Top 10 Campaigns by CTR")
-    top_ctr = filtered.groupby('campaign ID')['Click-Through Rate (CTR in %)'].mean().nlargest(10).reset_index()
+
+# --- Top 10 Campaigns by CTR ---
+def top10_ctr_figure(by_campaign: pd.DataFrame):
+    top_ctr = by_campaign.nlargest(10, 'Click-Through Rate (CTR in %)')[['campaign ID', 'Click-Through Rate (CTR in %)']]
     fig_top10_ctr = px.bar(top_ctr, x='Click-Through Rate (CTR in %)', y='campaign ID', orientation='h',
                         title='Top 10 Campaigns by Average CTR', color='Click-Through Rate (CTR in %)')
     apply_custom_layout(fig_top10_ctr, xaxis_label="CTR (%)", yaxis_label="Campaign ID", update_trace=False)
-    st.plotly_chart(fig_top10_ctr, use_container_width=True)
+    return fig_top10_ctr
+
 
-    # --- Impressions by Age Group ---
-    st.subheader("📊 Impressions by Age Group")
-    imp_age = filtered.groupby('Age')['Impressions'].sum().reset_index()
-    fig_imp_age = px.pie(imp_age, names='Age', values='Impressions', title='Impressions Distribution by Age Group')
+# --- Impressions by Age Group ---
+def impressions_by_age_figure(by_age: pd.DataFrame):
+    fig_imp_age = px.pie(by_age, names='Age', values='Impressions', title='Impressions Distribution by Age Group')
     apply_custom_layout(fig_imp_age, xaxis_label="Age Group", yaxis_label="Impressions", update_trace= False)
-    st.plotly_chart(fig_imp_age, use_container_width=True)
+    return fig_imp_age
 
-    # --- Bubble Chart: CPR vs CTR with Spend as Size ---
-    st.subheader("📌 CPR vs CTR Bubble Chart")
+
+# --- Bubble Chart: CPR vs CTR with Spend as Size ---
+def cpr_vs_ctr_bubble_figure(filtered: pd.DataFrame):
     fig_bubble = px.scatter(filtered, x='Click-Through Rate (CTR in %)', y='Cost per Result (CPR)',
                             size='Amount Spent', color='Geography', hover_name='campaign ID',
                             title="CTR vs CPR (Bubble Size = Spend)")
-    fig_top10_ctr.update_traces(texttemplate='%{x:.2f}%', textposition='outside')
     apply_custom_layout(fig_bubble, xaxis_label="CTR (%)", yaxis_label="CPR ", update_trace=False)
-    st.plotly_chart(fig_bubble, use_container_width=True)
+    return fig_bubble
+
 
-    # --- Cost per Result (CPR) by Age and Geography ---
-    st.subheader("📊 Cost per Result (CPR) by Age and Geography")
-    cpr_geo_age = filtered.groupby(['Geography', 'Age'])['Cost per Result (CPR)'].mean().reset_index()
-    fig_cpr_geo_age = px.bar(cpr_geo_age, x='Geography', y='Cost per Result (CPR)', color='Age',
+# --- Cost per Result (CPR) by Age and Geography ---
+def cpr_by_age_geo_figure(by_geography_age: pd.DataFrame):
+    fig_cpr_geo_age = px.bar(by_geography_age, x='Geography', y='Cost per Result (CPR)', color='Age',
                             barmode='group', title='CPR by Age and Geography')
     apply_custom_layout(fig_cpr_geo_age, xaxis_label="Geography", yaxis_label="CPR ", update_trace=False)
-    st.plotly_chart(fig_cpr_geo_age, use_container_width=True)
+    return fig_cpr_geo_age
+
 
-    # --- Clicks vs Frequency ---
-    st.subheader("📍 Clicks vs Frequency")
+# --- Clicks vs Frequency ---
+def clicks_vs_frequency_figure(filtered: pd.DataFrame):
     fig_clicks_freq = px.scatter(filtered, x='Frequency', y='Clicks',
                                 color='Age', hover_name='campaign ID',
                                 title='Clicks vs Frequency')
     fig_clicks_freq.update_traces(texttemplate='%{y}', textposition='top center')
     apply_custom_layout(fig_clicks_freq, xaxis_label="Frequency", yaxis_label="Clicks", update_trace=False)
-    st.plotly_chart(fig_clicks_freq, use_container_width=True)
\ No newline at end of file
+    return fig_clicks_freq
+
+
+def additional_figure_builders(context: AnalysisContext):
+    # Subheader -> figure builder, in page order. Aggregated charts draw from
+    # the shared context, so e.g. the geography spend behind the bar chart and
+    # the map is the same frame the main page already built.
+    filtered = context.filtered
+
+    return {
+        "CPC by Age Group": lambda: cpc_by_age_figure(context['by_age']),
+        "CTR by Age Group": lambda: ctr_by_age_figure(context['by_age']),
+        "CPC vs CPR": lambda: cpc_vs_cpr_figure(filtered),
+        "Amount Spent by Geography": lambda: geo_spend_figure(context['by_geography']),
+        "Clicks vs Impressions": lambda: clicks_vs_impressions_figure(context['by_campaign']),
+        "Clicks vs Unique Clicks vs Unique Link Clicks": lambda: clicks_vs_unique_clicks_figure(context['by_campaign']),
+        "CTR vs Frequency": lambda: ctr_vs_frequency_figure(filtered),
+        "Spend per Click by Campaign": lambda: spend_per_click_figure(filtered),
+        "🗺️ Spend by Geography Map": lambda: geo_spend_map_figure(context['by_geography']),
+        "🏆 Top 10 Campaigns by CTR": lambda: top10_ctr_figure(context['by_campaign']),
+        "📊 Impressions by Age Group": lambda: impressions_by_age_figure(context['by_age']),
+        "📌 CPR vs CTR Bubble Chart": lambda: cpr_vs_ctr_bubble_figure(filtered),
+        "📊 Cost per Result (CPR) by Age and Geography": lambda: cpr_by_age_geo_figure(context['by_geography_age']),
+        "📍 Clicks vs Frequency": lambda: clicks_vs_frequency_figure(filtered),
+    }
+
+
+def additional_visualizations(context: AnalysisContext):
+    # The figures only depend on the filtered rows and their aggregates, so
+    # they are built concurrently and emitted in page order
+    figures = build_figures(additional_figure_builders(context))
+
+    for subheader, fig in figures.items():
+        st.subheader(subheader)
+        st.plotly_chart(fig, use_container_width=True)